@@ -23,6 +23,57 @@ class Settings(BaseSettings):
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "Dunning and Curing Management System"
     
+    # Dunning engine
+    DUNNING_BATCH_SIZE: int = 500  # Customers fetched per keyset chunk
+    DUNNING_COMMIT_BATCH_SIZE: int = 100  # Customers written per transaction
+    DUNNING_WORKERS: int = 1  # Worker processes per run (1 = run in the request process)
+    DUNNING_SHARDS_PER_WORKER: int = 4  # Id ranges queued per worker to even out skew
+    DUNNING_JOB_THREADS: int = 2  # Background dunning jobs run concurrently per API process
+    DUNNING_COALESCE_NOTIFICATIONS: bool = False  # One message per channel when several rules fire for a customer
+    DUNNING_EVALUATION_MODE: str = "orm"  # "orm" or "vectorized" (NumPy rule matching, needs numpy)
+    DUNNING_VECTOR_CHUNK_SIZE: int = 50000  # Customers loaded into column arrays per vectorized chunk
+    
+    # Notifications
+    NOTIFICATION_DISPATCH_MODE: str = "inline"  # "inline" sends in the caller's transaction, "outbox" leaves PENDING rows for the dispatcher
+    NOTIFICATION_DISPATCH_BATCH_SIZE: int = 100  # PENDING rows claimed per dispatcher batch
+    NOTIFICATION_GATEWAY: str = "log"  # "log" (simulated providers) or "fake" (configurable latency, for load tests)
+    NOTIFICATION_SMS_CONCURRENCY: int = 8  # In-flight gateway calls per channel
+    NOTIFICATION_EMAIL_CONCURRENCY: int = 8
+    NOTIFICATION_APP_CONCURRENCY: int = 16
+    NOTIFICATION_FAKE_LATENCY_MS: float = 50  # Fake gateway round trip
+    NOTIFICATION_FAKE_FAILURE_RATE: float = 0.0
+    NOTIFICATION_FAKE_BATCH_SIZE: int = 1  # Recipients per fake gateway call (1 = no batch API)
+    NOTIFICATION_DISPATCH_POLL_INTERVAL: float = 1.0  # Seconds to sleep when the outbox is empty
+    NOTIFICATION_URGENT_POLL_INTERVAL: float = 0.1  # Poll interval of dispatchers serving only the URGENT lane
+    NOTIFICATION_URGENT_RULE_PRIORITY: int = 6  # Rules at or above this priority notify on the URGENT lane
+    NOTIFICATION_MAX_ATTEMPTS: int = 5  # Sends per notification before it is dead-lettered
+    NOTIFICATION_RETRY_BASE_SECONDS: float = 30  # Backoff before the first retry, doubled per attempt
+    NOTIFICATION_RETRY_MAX_SECONDS: float = 3600  # Backoff cap
+    NOTIFICATION_SMS_RATE_PER_SECOND: float = 0  # Provider quota per channel (0 = unlimited)
+    NOTIFICATION_EMAIL_RATE_PER_SECOND: float = 0
+    NOTIFICATION_APP_RATE_PER_SECOND: float = 0
+    NOTIFICATION_RATE_LIMIT_BURST_SECONDS: float = 1.0  # Bucket capacity = rate * burst seconds
+    NOTIFICATION_RATE_LIMIT_BACKEND: str = "local"  # "local" (per process) or "db" (shared by all workers)
+    NOTIFICATION_RATE_LIMIT_LEASE: int = 10  # Tokens a worker takes from the shared bucket per round trip
+    NOTIFICATION_DELIVERY_RECEIPTS: bool = False  # Gateway-accepted sends stay SENT until a delivery receipt arrives
+    NOTIFICATION_RECEIPT_CHUNK_SIZE: int = 1000  # Provider message ids per bulk receipt UPDATE
+    
+    # Curing
+    CURING_MODE: str = "sync"  # "sync" cures inside the webhook, "queued" acks with 202 and leaves a curing job for the worker
+    CURING_WORKER_BATCH_SIZE: int = 50  # Curing jobs claimed per worker poll
+    CURING_WORKER_POLL_INTERVAL: float = 0.5  # Seconds to sleep when no job is ready
+    CURING_JOB_MAX_ATTEMPTS: int = 3  # Runs of a job that hit unexpected errors before it is FAILED
+    CURING_JOB_STALE_SECONDS: int = 300  # RUNNING jobs older than this (crashed worker) are queued again
+    SETTLEMENT_CHUNK_SIZE: int = 1000  # Settlement file rows deduped, inserted and cured per transaction
+    PAYMENT_BATCH_CURING_THREADS: int = 4  # Sessions curing the customers of one batched webhook in parallel
+    CUSTOMER_UPDATE_MAX_ATTEMPTS: int = 3  # Versioned writes of a customer that changed concurrently before curing or dunning gives up
+    
+    # Retention
+    RETENTION_NOTIFICATION_DAYS: int = 180  # Sent notifications older than this are archived
+    RETENTION_DUNNING_LOG_DAYS: int = 365
+    RETENTION_CHUNK_SIZE: int = 1000  # Rows archived and deleted per transaction
+    RETENTION_CHUNK_PAUSE_SECONDS: float = 0.5  # Sleep between chunks, to run alongside live traffic
+    
     # CORS
     CORS_ORIGINS: list = ["http://localhost:5173", "http://localhost:3000"]
     
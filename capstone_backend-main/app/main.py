@@ -5,10 +5,13 @@ Entry point for the Dunning and Curing Management System
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
+import threading
 from app.config.settings import settings
 from app.routers import curing
 from app.config.database import engine, Base
-from app.routers import customers, dunning, payments, curing, payment_success, customer_portal, chatbot
+from app.routers import customers, dunning, payments, curing, payment_success, customer_portal, chatbot, notifications
+from app.services.dunning_jobs import recover_orphaned_jobs
+from app.services.dunning_scheduler import backfill_schedule
 
 
 # Configure logging
@@ -47,7 +50,21 @@ app.include_router(customer_portal.router, prefix=settings.API_V1_PREFIX)
 app.include_router(payment_success.router, prefix=settings.API_V1_PREFIX)  # NEW
 app.include_router(curing.router, prefix=settings.API_V1_PREFIX)
 app.include_router(chatbot.router, prefix=settings.API_V1_PREFIX)
+app.include_router(notifications.router, prefix=settings.API_V1_PREFIX)
 
+@app.on_event("startup")
+def start_schedule_backfill():
+    """
+    Give customers without a next_action_date a schedule, off the startup path
+    """
+    threading.Thread(target=backfill_schedule, name="schedule-backfill", daemon=True).start()
+
+@app.on_event("startup")
+def recover_dunning_jobs():
+    """
+    Fail dunning jobs a restart interrupted and resubmit the ones still queued
+    """
+    recover_orphaned_jobs()
 
 @app.get("/")
 def root():
@@ -7,6 +7,14 @@ from .payment import Payment
 from .notification import Notification
 from .curing_action import CuringAction
 from .dunning_log import DunningLog
+from .rule_set_version import RuleSetVersion
+from .dunning_run_ledger import DunningRunLedger
+from .dunning_job import DunningJob
+from .dunning_job_result import DunningJobResult
+from .rate_limit_bucket import RateLimitBucket
+from .archive_batch import ArchiveBatch
+from .retention_cursor import RetentionCursor
+from .curing_job import CuringJob
 
 __all__ = [
     "Customer",
@@ -14,5 +22,13 @@ __all__ = [
     "Payment",
     "Notification",
     "CuringAction",
-    "DunningLog"
+    "DunningLog",
+    "RuleSetVersion",
+    "DunningRunLedger",
+    "DunningJob",
+    "DunningJobResult",
+    "RateLimitBucket",
+    "ArchiveBatch",
+    "RetentionCursor",
+    "CuringJob"
 ]
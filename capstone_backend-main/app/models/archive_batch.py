@@ -0,0 +1,23 @@
+"""
+ArchiveBatch SQLAlchemy Model
+"""
+from sqlalchemy import Column, Integer, String, LargeBinary, TIMESTAMP, Index
+from sqlalchemy.dialects.mysql import LONGBLOB
+from sqlalchemy.sql import func
+from app.config.database import Base
+
+class ArchiveBatch(Base):
+    __tablename__ = "archive_batches"
+    __table_args__ = (
+        Index("idx_archive_table_first_id", "table_name", "first_id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)  # Source table, e.g. "notifications"
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    oldest_created_at = Column(TIMESTAMP, nullable=True)
+    newest_created_at = Column(TIMESTAMP, nullable=True)
+    payload = Column(LargeBinary().with_variant(LONGBLOB(), "mysql"), nullable=False)  # zlib-compressed JSON rows
+    created_at = Column(TIMESTAMP, server_default=func.now())
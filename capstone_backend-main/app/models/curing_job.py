@@ -0,0 +1,25 @@
+"""
+CuringJob SQLAlchemy Model
+"""
+from sqlalchemy import Column, Integer, Text, Enum, JSON, ForeignKey, TIMESTAMP, Index
+from sqlalchemy.sql import func
+from app.config.database import Base
+from app.utils.enums import CuringJobStatus
+
+class CuringJob(Base):
+    __tablename__ = "curing_jobs"
+    __table_args__ = (
+        # Head-of-line check: earlier unfinished jobs of the same customer
+        Index("idx_curing_job_customer_status", "customer_id", "status"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    payment_id = Column(Integer, ForeignKey("payments.id", ondelete="CASCADE"), nullable=False, unique=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    status = Column(Enum(CuringJobStatus), default=CuringJobStatus.QUEUED, nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    result = Column(JSON)  # CuringService.execute_curing result
+    error_message = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    started_at = Column(TIMESTAMP, nullable=True)
+    finished_at = Column(TIMESTAMP, nullable=True)
@@ -1,7 +1,7 @@
 """
 Customer SQLAlchemy Model
 """
-from sqlalchemy import Column, Integer, String, Date, Enum, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Date, Enum, TIMESTAMP, Index
 from sqlalchemy.types import DECIMAL
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -10,6 +10,10 @@ from app.utils.enums import CustomerType, DunningStatus
 
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = (
+        # Dunning candidate selection: customer_type = ? AND due_date IN (trigger dates)
+        Index("idx_customer_type_due_date", "customer_type", "due_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     name = Column(String(100), nullable=False)
@@ -22,6 +26,8 @@ class Customer(Base):
     overdue_days = Column(Integer, default=0, index=True)
     outstanding_amount = Column(DECIMAL(10, 2), default=0.00)
     dunning_status = Column(Enum(DunningStatus), default=DunningStatus.ACTIVE, index=True)
+    next_action_date = Column(Date, nullable=True, index=True)  # Maintained by DunningScheduler
+    version = Column(Integer, nullable=False, default=0)  # Compare-and-swap counter (see customer_versioning)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     
@@ -30,3 +36,6 @@ class Customer(Base):
     notifications = relationship("Notification", back_populates="customer", cascade="all, delete-orphan")
     curing_actions = relationship("CuringAction", back_populates="customer", cascade="all, delete-orphan")
     dunning_logs = relationship("DunningLog", back_populates="customer", cascade="all, delete-orphan")
+    
+    # Every ORM UPDATE checks and bumps the version, so a write based on a stale read fails
+    __mapper_args__ = {"version_id_col": version}
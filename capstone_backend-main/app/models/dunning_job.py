@@ -0,0 +1,29 @@
+"""
+DunningJob SQLAlchemy Model
+"""
+from sqlalchemy import Column, Integer, Boolean, Text, Enum, JSON, TIMESTAMP
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.config.database import Base
+from app.utils.enums import DunningJobStatus
+
+class DunningJob(Base):
+    __tablename__ = "dunning_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    status = Column(Enum(DunningJobStatus), default=DunningJobStatus.QUEUED, nullable=False, index=True)
+    request = Column(JSON)  # DunningExecutionRequest the job was started with
+    total_customers = Column(Integer, default=0)
+    unmatched_customers = Column(Integer, default=0)  # Skipped up front, never loaded
+    processed = Column(Integer, default=0)
+    successful = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    cancel_requested = Column(Boolean, default=False)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    started_at = Column(TIMESTAMP, nullable=True)
+    finished_at = Column(TIMESTAMP, nullable=True)
+    
+    # Relationships
+    results = relationship("DunningJobResult", back_populates="job", cascade="all, delete-orphan", passive_deletes=True)
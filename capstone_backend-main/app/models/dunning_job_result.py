@@ -0,0 +1,23 @@
+"""
+DunningJobResult SQLAlchemy Model
+"""
+from sqlalchemy import Column, Integer, String, Text, JSON, ForeignKey
+from sqlalchemy.orm import relationship
+from app.config.database import Base
+
+class DunningJobResult(Base):
+    __tablename__ = "dunning_job_results"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, ForeignKey("dunning_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    customer_id = Column(Integer, nullable=False)
+    customer_name = Column(String(100))
+    overdue_days = Column(Integer, default=0)
+    rules_applied = Column(Integer, default=0)
+    actions_taken = Column(JSON)
+    notifications_sent = Column(Integer, default=0)
+    status = Column(String(20), nullable=False)  # SUCCESS, FAILED, SKIPPED
+    message = Column(Text, nullable=True)
+    
+    # Relationships
+    job = relationship("DunningJob", back_populates="results")
@@ -0,0 +1,19 @@
+"""
+DunningRunLedger SQLAlchemy Model
+"""
+from sqlalchemy import Column, Integer, Date, ForeignKey, TIMESTAMP, UniqueConstraint
+from sqlalchemy.sql import func
+from app.config.database import Base
+
+class DunningRunLedger(Base):
+    __tablename__ = "dunning_run_ledger"
+    __table_args__ = (
+        # Serves the per-batch lookup (as_of_date, customer_id IN ...) and blocks double execution
+        UniqueConstraint("as_of_date", "customer_id", "rule_id", name="uq_ledger_date_customer_rule"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    as_of_date = Column(Date, nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False, index=True)
+    rule_id = Column(Integer, ForeignKey("dunning_rules.id", ondelete="CASCADE"), nullable=False)
+    executed_at = Column(TIMESTAMP, server_default=func.now())
@@ -1,22 +1,35 @@
 """
 Notification SQLAlchemy Model
 """
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Text, JSON, Enum, ForeignKey, TIMESTAMP, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.config.database import Base
-from app.utils.enums import NotificationChannel, NotificationStatus
+from app.utils.enums import NotificationChannel, NotificationStatus, NotificationLane
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Retry scheduler scan: FAILED rows whose next attempt is due
+        Index("idx_notification_status_next_attempt", "status", "next_attempt_at"),
+        # Dispatcher claims one lane at a time, most urgent first
+        Index("idx_notification_lane_status_next_attempt", "lane", "status", "next_attempt_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False, index=True)
     rule_id = Column(Integer, ForeignKey("dunning_rules.id", ondelete="SET NULL"), nullable=True)
     channel = Column(Enum(NotificationChannel), nullable=False, index=True)
-    message = Column(Text, nullable=False)
+    message = Column(Text, nullable=True)  # Free text; NULL when rendered from template_id
+    template_id = Column(String(64), nullable=True)  # Versioned id in the notification template registry
+    template_params = Column(JSON, nullable=True)
     status = Column(Enum(NotificationStatus), default=NotificationStatus.PENDING, index=True)
+    lane = Column(Enum(NotificationLane), default=NotificationLane.STANDARD, nullable=False)
     sent_at = Column(TIMESTAMP, nullable=True)
+    attempt_count = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(TIMESTAMP, nullable=True)  # Set while a FAILED send waits for its retry
+    last_error = Column(Text, nullable=True)
+    provider_message_id = Column(String(100), nullable=True, index=True)  # Gateway's id, the key of delivery receipts
     created_at = Column(TIMESTAMP, server_default=func.now())
     
     # Relationships
@@ -0,0 +1,12 @@
+"""
+RateLimitBucket SQLAlchemy Model
+"""
+from sqlalchemy import Column, String, Float
+from app.config.database import Base
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    
+    name = Column(String(50), primary_key=True)  # e.g. "notification:SMS"
+    tokens = Column(Float, nullable=False)
+    refilled_at = Column(Float, nullable=False)  # Unix time of the last refill
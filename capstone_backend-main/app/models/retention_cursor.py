@@ -0,0 +1,13 @@
+"""
+RetentionCursor SQLAlchemy Model
+"""
+from sqlalchemy import Column, Integer, String, TIMESTAMP
+from sqlalchemy.sql import func
+from app.config.database import Base
+
+class RetentionCursor(Base):
+    __tablename__ = "retention_cursors"
+    
+    table_name = Column(String(50), primary_key=True)  # Archived table, e.g. "notifications"
+    last_scanned_id = Column(Integer, default=0, nullable=False)  # The next run resumes after this id
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
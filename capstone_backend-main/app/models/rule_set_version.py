@@ -0,0 +1,13 @@
+"""
+RuleSetVersion SQLAlchemy Model
+"""
+from sqlalchemy import Column, Integer, TIMESTAMP
+from sqlalchemy.sql import func
+from app.config.database import Base
+
+class RuleSetVersion(Base):
+    __tablename__ = "rule_set_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -1,2 +1,2 @@
-from . import customers, dunning, payments, curing, payment_success
-__all__ = ["customers", "dunning", "payments", "curing", "payment_success"]
+from . import customers, dunning, payments, curing, payment_success, notifications
+__all__ = ["customers", "dunning", "payments", "curing", "payment_success", "notifications"]
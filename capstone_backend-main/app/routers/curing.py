@@ -8,8 +8,9 @@ from app.config.database import get_db
 from app.models.customer import Customer
 from app.models.payment import Payment
 from app.models.curing_action import CuringAction
-from app.schemas.curing import CuringTriggerRequest, CuringActionResponse, CuringExecutionResponse
+from app.schemas.curing import CuringTriggerRequest, CuringActionResponse, CuringExecutionResponse, CuringJobResponse
 from app.services.curing_service import CuringService
+from app.services.curing_jobs import CuringJobService
 import logging
 
 router = APIRouter(prefix="/curing", tags=["Curing Operations"])
@@ -128,4 +129,18 @@ def get_curing_actions_count(db: Session = Depends(get_db)):
         return {"count": count}
     except Exception as e:
         logger.error(f"Error counting curing actions: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.get("/jobs/{transaction_id}", response_model=CuringJobResponse)
+def get_curing_job(transaction_id: str, db: Session = Depends(get_db)):
+    """
+    Status of the curing job queued for a payment (CURING_MODE=queued)
+    """
+    service = CuringJobService(db)
+    found = service.get_by_transaction_id(transaction_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Curing job not found")
+    
+    job, transaction_id = found
+    return service.build_response(job, transaction_id)
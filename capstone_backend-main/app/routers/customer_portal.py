@@ -5,6 +5,7 @@ from app.models.customer import Customer
 from app.models.payment import Payment
 from app.models.notification import Notification
 from app.services.curing_service import CuringService
+from app.services.notification_templates import render_notification
 from app.utils.enums import PaymentStatus, PaymentMethod
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
@@ -128,7 +129,7 @@ def get_customer_profile(customer_id: int, db: Session = Depends(get_db)):
             "notifications": [
                 {
                     "id": n.id,
-                    "message": n.message,
+                    "message": render_notification(n),
                     "channel": n.channel,
                     "status": n.status,
                     "created_at": n.created_at.isoformat() if n.created_at else None
@@ -8,6 +8,7 @@ from app.config.database import get_db
 from app.models.customer import Customer
 from app.schemas.customer import CustomerCreate, CustomerUpdate, CustomerResponse, CustomerStatus
 from app.utils.enums import CustomerType, DunningStatus
+from app.services.dunning_scheduler import DunningScheduler
 
 router = APIRouter(prefix="/customers", tags=["Customers"])
 
@@ -54,6 +55,7 @@ def create_customer(customer_data: CustomerCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=400, detail="Email already registered")
     
     customer = Customer(**customer_data.model_dump())
+    DunningScheduler(db).refresh_customer(customer)
     db.add(customer)
     db.commit()
     db.refresh(customer)
@@ -73,9 +75,14 @@ def update_customer(
         raise HTTPException(status_code=404, detail="Customer not found")
     
     # Update only provided fields
-    for key, value in customer_data.model_dump(exclude_unset=True).items():
+    update_data = customer_data.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
         setattr(customer, key, value)
     
+    # Keep the dunning schedule in step with billing changes
+    if {"due_date", "outstanding_amount"} & update_data.keys():
+        DunningScheduler(db).refresh_customer(customer)
+    
     db.commit()
     db.refresh(customer)
     return customer
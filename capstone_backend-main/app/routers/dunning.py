@@ -1,21 +1,24 @@
 """
 Dunning Operations API Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
-import time
+from typing import List, Optional, Union
 from app.config.database import get_db
 from app.schemas.dunning import (
     DunningRuleCreate, DunningRuleUpdate, DunningRuleResponse,
-    DunningExecutionRequest, DunningExecutionResponse, DunningExecutionResult,
-    DunningLogResponse
+    DunningExecutionRequest, DunningExecutionResponse,
+    DunningLogResponse, DunningJobResponse, DunningJobResultsResponse
 )
 from app.models.dunning_rule import DunningRule
 from app.models.dunning_log import DunningLog
 from app.models.customer import Customer
 from app.services.rule_engine import RuleEngine
+from app.services.dunning_runner import DunningRunner, stream_dunning_run
+from app.services.rule_index import bump_rule_set_version
+from app.services.dunning_scheduler import DunningScheduler, rebuild_schedule
+from app.services.dunning_jobs import DunningJobService, FINISHED_STATUSES
 from app.utils.enums import CustomerType
 
 router = APIRouter(prefix="/dunning", tags=["Dunning Operations"])
@@ -53,20 +56,29 @@ def get_dunning_rule(rule_id: int, db: Session = Depends(get_db)):
     return rule
 
 @router.post("/rules", response_model=DunningRuleResponse, status_code=201)
-def create_dunning_rule(rule_data: DunningRuleCreate, db: Session = Depends(get_db)):
+def create_dunning_rule(
+    rule_data: DunningRuleCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """
     Create new dunning rule
     """
     rule = DunningRule(**rule_data.model_dump())
     db.add(rule)
+    bump_rule_set_version(db)
     db.commit()
     db.refresh(rule)
+    
+    # Trigger days changed - recompute every customer's next action date
+    background_tasks.add_task(rebuild_schedule)
     return rule
 
 @router.put("/rules/{rule_id}", response_model=DunningRuleResponse)
 def update_dunning_rule(
     rule_id: int,
     rule_data: DunningRuleUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -79,12 +91,19 @@ def update_dunning_rule(
     for key, value in rule_data.model_dump(exclude_unset=True).items():
         setattr(rule, key, value)
     
+    bump_rule_set_version(db)
     db.commit()
     db.refresh(rule)
+    
+    background_tasks.add_task(rebuild_schedule)
     return rule
 
 @router.delete("/rules/{rule_id}", status_code=204)
-def delete_dunning_rule(rule_id: int, db: Session = Depends(get_db)):
+def delete_dunning_rule(
+    rule_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """
     Delete dunning rule
     """
@@ -93,63 +112,100 @@ def delete_dunning_rule(rule_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Dunning rule not found")
     
     db.delete(rule)
+    bump_rule_set_version(db)
     db.commit()
+    
+    background_tasks.add_task(rebuild_schedule)
     return None
 
 # ============== Dunning Execution ==============
 
-@router.post("/apply", response_model=DunningExecutionResponse)
+@router.post("/apply", response_model=Union[DunningExecutionResponse, DunningJobResponse])
 def apply_dunning_all(
+    response: Response,
     request: Optional[DunningExecutionRequest] = None,
     db: Session = Depends(get_db)
 ):
     """
     Trigger dunning for all overdue customers or specific customer IDs
+    Large runs can be sharded across worker processes (request.workers / DUNNING_WORKERS)
+    With request.background the run is queued and a job is returned (202)
     """
-    start_time = time.time()
-    rule_engine = RuleEngine(db)
-    
-    results = []
-    
-    if request and request.customer_ids:
-        # Process specific customers
-        for customer_id in request.customer_ids:
-            result = rule_engine.process_customer(customer_id)
-            results.append(result)
-    else:
-        # Process all overdue customers
-        results = rule_engine.process_all_overdue_customers()
-    
-    # Calculate statistics
-    successful = sum(1 for r in results if r.get("status") == "SUCCESS")
-    failed = sum(1 for r in results if r.get("status") == "FAILED")
-    skipped = sum(1 for r in results if r.get("status") == "SKIPPED")
-    
-    execution_time = time.time() - start_time
-    
-    # Convert results to response format
-    execution_results = []
-    for r in results:
-        execution_results.append(DunningExecutionResult(
-            customer_id=r["customer_id"],
-            customer_name=r.get("customer_name", "Unknown"),
-            overdue_days=r.get("overdue_days", 0),
-            rules_applied=r.get("rules_applied", 0),
-            actions_taken=r.get("actions_taken", []),
-            notifications_sent=r.get("notifications_sent", 0),
-            status=r["status"],
-            message=r.get("message")
-        ))
+    if request and request.background:
+        job_service = DunningJobService(db)
+        job = job_service.create_job(request)
+        response.status_code = 202
+        return job_service.build_response(job)
     
-    return DunningExecutionResponse(
-        total_customers=len(results),
-        successful=successful,
-        failed=failed,
-        skipped=skipped,
-        results=execution_results,
-        execution_time=execution_time
+    runner = DunningRunner(db)
+    return runner.run(request)
+
+@router.post("/apply/stream")
+def apply_dunning_stream(request: Optional[DunningExecutionRequest] = None):
+    """
+    Trigger dunning and stream results as NDJSON (application/x-ndjson)
+    One line per processed customer as soon as its batch commits, then a summary line
+    """
+    return StreamingResponse(
+        stream_dunning_run(request),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}  # Don't let nginx buffer the stream
     )
 
+@router.get("/jobs/{job_id}", response_model=DunningJobResponse)
+def get_dunning_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Get background job status with live counters, rate and ETA
+    """
+    job_service = DunningJobService(db)
+    job = job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Dunning job not found")
+    return job_service.build_response(job)
+
+@router.get("/jobs/{job_id}/results", response_model=DunningJobResultsResponse)
+def get_dunning_job_results(
+    job_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Get per-customer results of a background job, in processing order
+    Results are available as soon as each batch is committed
+    """
+    job_service = DunningJobService(db)
+    if not job_service.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Dunning job not found")
+    
+    total, results = job_service.get_results(job_id, skip, limit)
+    return DunningJobResultsResponse(job_id=job_id, total=total, skip=skip, limit=limit, results=results)
+
+@router.post("/jobs/{job_id}/cancel", response_model=DunningJobResponse)
+def cancel_dunning_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Request cancellation - the job stops after the batch it is processing
+    Customers already processed keep their committed actions
+    """
+    job_service = DunningJobService(db)
+    job = job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Dunning job not found")
+    if job.status in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Dunning job already {job.status.value}")
+    
+    job = job_service.request_cancel(job)
+    return job_service.build_response(job)
+
+@router.post("/schedule/rebuild", response_model=dict)
+def rebuild_dunning_schedule(db: Session = Depends(get_db)):
+    """
+    Recompute next_action_date for all customers
+    Run after bulk imports or direct SQL changes to customers
+    """
+    scheduler = DunningScheduler(db)
+    return scheduler.rebuild()
+
 @router.post("/apply/{customer_id}", response_model=dict)
 def apply_dunning_single(customer_id: int, db: Session = Depends(get_db)):
     """
@@ -0,0 +1,22 @@
+"""
+Notification API Endpoints
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.config.database import get_db
+from app.schemas.notification import DeliveryReceiptBatch, DeliveryReceiptResponse
+from app.services.notification_service import NotificationService
+
+router = APIRouter(prefix="/notifications", tags=["Notifications"])
+
+@router.post("/receipts", response_model=DeliveryReceiptResponse)
+def ingest_delivery_receipts(batch: DeliveryReceiptBatch, db: Session = Depends(get_db)):
+    """
+    Apply a batch of gateway delivery callbacks, keyed by provider message id
+    The whole batch is applied with a few set-based UPDATEs
+    """
+    notification_service = NotificationService(db)
+    return notification_service.apply_delivery_receipts([
+        (receipt.provider_message_id, receipt.status, receipt.error)
+        for receipt in batch.receipts
+    ])
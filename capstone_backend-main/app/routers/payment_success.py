@@ -2,16 +2,16 @@
 Payment Success Endpoint - Sprint 2
 Handles payment gateway success callbacks
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import Dict, Any
-from datetime import datetime
 from app.config.database import get_db
-from app.models.customer import Customer
-from app.models.payment import Payment
+from app.config.settings import settings
 from app.schemas.payment import PaymentWebhook
-from app.utils.enums import PaymentStatus, PaymentMethod
+from app.utils.enums import PaymentStatus
 from app.services.curing_service import CuringService
+from app.services.payment_ingestion import PaymentIngestionService
+from app.utils.exceptions import CustomerNotFoundException, InvalidPaymentException
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,72 +21,84 @@ router = APIRouter(prefix="/payment-success", tags=["Payment Success"])
 @router.post("/", response_model=Dict[str, Any])
 def handle_payment_success(
     webhook_data: PaymentWebhook,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
     Handle payment success webhook from payment gateway
-    Automatically triggers curing workflow
+    Automatically triggers curing workflow, or queues it and returns 202
+    when CURING_MODE=queued
     """
     try:
         logger.info(f"📥 Received payment success webhook: {webhook_data.transaction_id}")
         
-        # Validate customer exists
-        customer = db.query(Customer).filter(
-            Customer.id == webhook_data.customer_id
-        ).first()
+        ingestion = PaymentIngestionService(db)
         
-        if not customer:
+        # Validate payment status (a retried callback is still reported as a duplicate)
+        if webhook_data.status.lower() != "success":
+            existing = ingestion.fetch(webhook_data.transaction_id)
+            if existing:
+                return {
+                    "status": "duplicate",
+                    "message": "Payment already processed",
+                    "payment_id": existing.payment.id,
+                    "customer_id": existing.customer.id,
+                    "customer_name": existing.customer.name
+                }
+            logger.warning(f"Payment status is {webhook_data.status}, not success")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Payment status must be 'success', got '{webhook_data.status}'"
+            )
+        
+        # Insert-first: a retried callback is detected by the unique transaction_id
+        try:
+            ingested = ingestion.ingest(
+                webhook_data, PaymentStatus.SUCCESS, enqueue_curing=settings.CURING_MODE == "queued"
+            )
+        except CustomerNotFoundException:
             logger.error(f"Customer {webhook_data.customer_id} not found")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Customer {webhook_data.customer_id} not found"
             )
+        except InvalidPaymentException as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
-        # Check for duplicate transaction
-        existing_payment = db.query(Payment).filter(
-            Payment.transaction_id == webhook_data.transaction_id
-        ).first()
+        customer = ingested.customer
+        payment = ingested.payment
         
-        if existing_payment:
-            logger.warning(f"Duplicate transaction: {webhook_data.transaction_id}")
+        if not ingested.created:
             return {
                 "status": "duplicate",
                 "message": "Payment already processed",
-                "payment_id": existing_payment.id,
+                "payment_id": payment.id,
                 "customer_id": customer.id,
                 "customer_name": customer.name
             }
         
-        # Validate payment status
-        if webhook_data.status.lower() != "success":
-            logger.warning(f"Payment status is {webhook_data.status}, not success")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Payment status must be 'success', got '{webhook_data.status}'"
-            )
-        
-        # Create payment record
-        payment = Payment(
-            customer_id=webhook_data.customer_id,
-            amount=webhook_data.amount,
-            payment_method=PaymentMethod[webhook_data.payment_method.upper()],
-            payment_status=PaymentStatus.SUCCESS,
-            transaction_id=webhook_data.transaction_id,
-            payment_date=webhook_data.timestamp
-        )
-        
-        db.add(payment)
-        db.flush()  # Get payment ID without committing
-        
         logger.info(f"💰 Payment created: ID={payment.id}, Amount=₹{payment.amount}")
         
-        # Trigger curing workflow
-        curing_service = CuringService(db)
-        curing_result = curing_service.execute_curing(customer.id, payment.id)
+        if ingested.curing_job_id:
+            logger.info(f"📨 Curing queued: job {ingested.curing_job_id} for customer {customer.id}")
+            response.status_code = status.HTTP_202_ACCEPTED
+            return {
+                "status": "queued",
+                "message": "Payment recorded and curing queued",
+                "payment_id": payment.id,
+                "transaction_id": payment.transaction_id,
+                "customer_id": customer.id,
+                "customer_name": customer.name,
+                "amount": float(payment.amount),
+                "curing_job_id": ingested.curing_job_id,
+                "status_url": f"{settings.API_V1_PREFIX}/curing/jobs/{payment.transaction_id}"
+            }
         
-        # Commit payment (curing service handles its own commit)
-        db.commit()
-        db.refresh(payment)
+        # Trigger curing workflow (the payment is already committed)
+        curing_service = CuringService(db)
+        curing_result = curing_service.execute_curing(
+            customer.id, payment.id, customer=customer, payment=payment
+        )
         
         if curing_result.get("success"):
             logger.info(f"✅ Payment success handler completed for customer {customer.id}")
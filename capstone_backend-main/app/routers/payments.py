@@ -1,16 +1,22 @@
 """
 Payment Management API Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+import io
 from app.config.database import get_db
+from app.config.settings import settings
 from app.models.payment import Payment
 from app.models.customer import Customer
-from app.schemas.payment import PaymentCreate, PaymentResponse, PaymentWebhook
+from app.schemas.payment import PaymentCreate, PaymentResponse, PaymentWebhook, PaymentWebhookBatch, PaymentWebhookBatchResponse
 from app.utils.enums import PaymentStatus
 from app.services.curing_service import CuringService
+from app.services.payment_ingestion import PaymentIngestionService
+from app.services.settlement_import import open_settlement_csv, stream_settlement_import
+from app.utils.exceptions import CustomerNotFoundException, InvalidPaymentException
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
@@ -75,47 +81,65 @@ def create_payment(payment_data: PaymentCreate, db: Session = Depends(get_db)):
     
     return payment
 
+@router.post("/settlement")
+def import_settlement(file: UploadFile = File(...)):
+    """
+    Import a gateway settlement CSV and cure its payments in batches
+    Streams back one NDJSON line per CSV row as each chunk finishes, then a summary line
+    """
+    try:
+        reader = open_settlement_csv(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
+    except (InvalidPaymentException, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        stream_settlement_import(reader),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}  # Don't let nginx buffer the stream
+    )
+
 @router.post("/webhook", status_code=200)
-def payment_webhook(webhook_data: PaymentWebhook, db: Session = Depends(get_db)):
+def payment_webhook(webhook_data: PaymentWebhook, response: Response, db: Session = Depends(get_db)):
     """
     Handle payment gateway webhook
     Receives payment confirmation from external payment gateway
+    With CURING_MODE=queued the payment is acknowledged with 202 and cured by a curing worker
     """
-    # Verify customer exists
-    customer = db.query(Customer).filter(Customer.id == webhook_data.customer_id).first()
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
+    queued = settings.CURING_MODE == "queued"
     
-    # Check if payment already exists
-    existing_payment = db.query(Payment).filter(
-        Payment.transaction_id == webhook_data.transaction_id
-    ).first()
+    # Insert-first: a retried callback is detected by the unique transaction_id
+    try:
+        ingested = PaymentIngestionService(db).ingest(webhook_data, enqueue_curing=queued)
+    except CustomerNotFoundException:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    except InvalidPaymentException as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if existing_payment:
+    payment = ingested.payment
+    if not ingested.created:
         return {
             "status": "duplicate",
             "message": "Payment already processed",
-            "payment_id": existing_payment.id
+            "payment_id": payment.id
         }
     
-    # Create payment record
-    payment = Payment(
-        customer_id=webhook_data.customer_id,
-        amount=webhook_data.amount,
-        payment_method=webhook_data.payment_method,
-        payment_status=PaymentStatus.SUCCESS if webhook_data.status.lower() == "success" else PaymentStatus.FAILED,
-        transaction_id=webhook_data.transaction_id,
-        payment_date=webhook_data.timestamp
-    )
-    
-    db.add(payment)
-    db.commit()
-    db.refresh(payment)
+    if ingested.curing_job_id:
+        response.status_code = 202
+        return {
+            "status": "queued",
+            "message": "Payment recorded and curing queued",
+            "payment_id": payment.id,
+            "transaction_id": payment.transaction_id,
+            "curing_job_id": ingested.curing_job_id,
+            "status_url": f"{settings.API_V1_PREFIX}/curing/jobs/{payment.transaction_id}"
+        }
     
     # Trigger curing if payment successful
-    if webhook_data.status.lower() == "success":
+    if payment.payment_status == PaymentStatus.SUCCESS:
         curing_service = CuringService(db)
-        curing_result = curing_service.execute_curing(customer.id, payment.id)
+        curing_result = curing_service.execute_curing(
+            ingested.customer.id, payment.id, customer=ingested.customer, payment=payment
+        )
         
         return {
             "status": "success",
@@ -129,3 +153,15 @@ def payment_webhook(webhook_data: PaymentWebhook, db: Session = Depends(get_db))
             "message": "Payment failed",
             "payment_id": payment.id
         }
+
+@router.post("/webhook/batch", response_model=PaymentWebhookBatchResponse)
+def payment_webhook_batch(batch: PaymentWebhookBatch, db: Session = Depends(get_db)):
+    """
+    Handle a batch of payment gateway webhooks
+    Each event is handled like /payments/webhook and gets its own result;
+    the batch costs a few set-based queries instead of a round trip per event
+    """
+    results = PaymentIngestionService(db).ingest_batch(
+        batch.events, enqueue_curing=settings.CURING_MODE == "queued"
+    )
+    return PaymentWebhookBatchResponse(received=len(batch.events), results=results)
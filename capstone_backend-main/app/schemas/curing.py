@@ -2,8 +2,9 @@
 Curing Pydantic Schemas
 """
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any
 from datetime import datetime
+from app.utils.enums import CuringJobStatus
 
 class CuringTriggerRequest(BaseModel):
     payment_id: int
@@ -31,3 +32,16 @@ class CuringExecutionResponse(BaseModel):
     notifications_sent: int
     success: bool
     message: str
+
+class CuringJobResponse(BaseModel):
+    job_id: int
+    transaction_id: str
+    payment_id: int
+    customer_id: int
+    status: CuringJobStatus
+    attempts: int
+    result: Optional[Dict[str, Any]] = None  # CuringService.execute_curing result once finished
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
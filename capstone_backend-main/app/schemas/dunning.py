@@ -4,7 +4,7 @@ Dunning-related Pydantic Schemas
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from app.utils.enums import CustomerType, ActionType, NotificationChannel
+from app.utils.enums import CustomerType, ActionType, NotificationChannel, DunningJobStatus
 
 # Dunning Rule Schemas
 class DunningRuleBase(BaseModel):
@@ -40,6 +40,8 @@ class DunningRuleResponse(DunningRuleBase):
 class DunningExecutionRequest(BaseModel):
     customer_ids: Optional[List[int]] = None  # None means all overdue customers
     force: Optional[bool] = False  # Force execution even if already executed today
+    workers: Optional[int] = Field(None, ge=1, le=64)  # None means settings.DUNNING_WORKERS
+    background: Optional[bool] = False  # Return a job id at once and run in the background
 
 class DunningExecutionResult(BaseModel):
     customer_id: int
@@ -59,6 +61,30 @@ class DunningExecutionResponse(BaseModel):
     results: List[DunningExecutionResult]
     execution_time: float  # seconds
 
+# Dunning Job Schemas
+class DunningJobResponse(BaseModel):
+    job_id: int
+    status: DunningJobStatus
+    total_customers: int
+    processed: int
+    successful: int
+    failed: int
+    skipped: int
+    rate: Optional[float] = None  # customers per second
+    eta_seconds: Optional[float] = None
+    cancel_requested: bool
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class DunningJobResultsResponse(BaseModel):
+    job_id: int
+    total: int
+    skip: int
+    limit: int
+    results: List[DunningExecutionResult]
+
 # Dunning Log Schemas
 class DunningLogResponse(BaseModel):
     id: int
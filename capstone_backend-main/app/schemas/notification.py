@@ -1,10 +1,11 @@
 """
 Notification Pydantic Schemas
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
-from app.utils.enums import NotificationChannel, NotificationStatus
+from app.utils.enums import NotificationChannel, NotificationStatus, DeliveryReceiptStatus
+from app.services.notification_templates import render_notification
 
 class NotificationBase(BaseModel):
     customer_id: int
@@ -17,12 +18,27 @@ class NotificationCreate(NotificationBase):
 class NotificationResponse(NotificationBase):
     id: int
     rule_id: Optional[int]
+    message: Optional[str] = None
+    template_id: Optional[str] = None
+    template_params: Optional[Dict[str, Any]] = None
     status: NotificationStatus
     sent_at: Optional[datetime]
     created_at: datetime
     
     class Config:
         from_attributes = True
+    
+    @model_validator(mode="before")
+    @classmethod
+    def render_message(cls, data: Any) -> Any:
+        # Rows sent from a template store template_id and parameters, not text
+        if not isinstance(data, dict) and getattr(data, "message", None) is None:
+            return {
+                key: getattr(data, key, None)
+                for key in ("id", "customer_id", "channel", "rule_id", "template_id",
+                            "template_params", "status", "sent_at", "created_at")
+            } | {"message": render_notification(data) or None}
+        return data
 
 class NotificationSendRequest(BaseModel):
     customer_ids: list[int]
@@ -34,3 +50,16 @@ class NotificationSendResponse(BaseModel):
     successful: int
     failed: int
     notification_ids: list[int]
+
+class DeliveryReceipt(BaseModel):
+    provider_message_id: str = Field(..., min_length=1, max_length=100)
+    status: DeliveryReceiptStatus
+    error: Optional[str] = None
+
+class DeliveryReceiptBatch(BaseModel):
+    receipts: List[DeliveryReceipt] = Field(..., min_length=1, max_length=10000)
+
+class DeliveryReceiptResponse(BaseModel):
+    received: int
+    updated: int  # Notification rows whose status changed
+    ignored: int  # Unknown ids, duplicates and receipts for already final rows
@@ -2,7 +2,7 @@
 Payment Pydantic Schemas
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from app.utils.enums import PaymentMethod, PaymentStatus
 
@@ -30,10 +30,27 @@ class PaymentResponse(PaymentBase):
 
 # Payment webhook schema (from payment gateway)
 class PaymentWebhook(BaseModel):
-    transaction_id: str
+    transaction_id: str = Field(..., min_length=1, max_length=100)
     customer_id: int
-    amount: float
+    amount: float = Field(..., gt=0)
     payment_method: str
     status: str  # success, failed, pending
     timestamp: datetime
     gateway_reference: Optional[str] = None
+
+# Batched payment webhook (gateways delivering callbacks in bulk)
+class PaymentWebhookBatch(BaseModel):
+    events: List[PaymentWebhook] = Field(..., min_length=1, max_length=1000)
+
+class PaymentWebhookEventResult(BaseModel):
+    index: int  # Position of the event in the batch
+    transaction_id: str
+    customer_id: int
+    status: str  # success, curing_failed, failed, queued, duplicate, customer_not_found, invalid
+    payment_id: Optional[int] = None
+    curing_job_id: Optional[int] = None
+    message: Optional[str] = None
+
+class PaymentWebhookBatchResponse(BaseModel):
+    received: int
+    results: List[PaymentWebhookEventResult]
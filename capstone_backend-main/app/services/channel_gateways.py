@@ -0,0 +1,217 @@
+"""
+Channel Gateways - asyncio adapters for the SMS, email and app channels
+Each channel has a bounded number of in-flight gateway calls, and gateways
+that accept multi-recipient requests are sent batches instead of single messages
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import random
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from app.config.settings import settings
+from app.utils.enums import NotificationChannel
+from app.services.rate_limiter import get_channel_limiter
+
+logger = logging.getLogger(__name__)
+
+SEND_CHANNELS = (NotificationChannel.SMS, NotificationChannel.EMAIL, NotificationChannel.APP)
+
+@dataclass
+class OutboundMessage:
+    """
+    One message for one channel, addressed by customer id, phone and email
+    provider_message_id is set by the gateway when it accepts the message
+    """
+    channel: NotificationChannel
+    customer_id: int
+    phone: Optional[str]
+    email: Optional[str]
+    message: str
+    subject: str = "Payment Reminder - Dunning Notice"
+    provider_message_id: Optional[str] = None
+
+class ChannelGateway(ABC):
+    """
+    Base adapter - one provider for one channel
+    max_batch_size > 1 means the provider accepts multi-recipient calls
+    """
+    max_batch_size = 1
+
+    def __init__(self, channel: NotificationChannel):
+        self.channel = channel
+
+    @abstractmethod
+    async def send(self, message: OutboundMessage) -> bool:
+        """
+        Send one message; True if the provider accepted it
+        """
+
+    async def send_batch(self, messages: List[OutboundMessage]) -> List[bool]:
+        """
+        Send several messages in one provider call (default: one call each)
+        """
+        return list(await asyncio.gather(*(self.send(m) for m in messages)))
+
+class LoggingGateway(ChannelGateway):
+    """
+    Simulated provider that logs the message (the service's original behaviour)
+    In production: Twilio / AWS SNS, SendGrid / AWS SES, Firebase / OneSignal
+    """
+
+    async def send(self, message: OutboundMessage) -> bool:
+        if self.channel == NotificationChannel.SMS:
+            logger.info(f"[SMS] Sending to {message.phone}")
+        elif self.channel == NotificationChannel.EMAIL:
+            logger.info(f"[EMAIL] Sending to {message.email}")
+            logger.info(f"[EMAIL] Subject: {message.subject}")
+        else:
+            logger.info(f"[APP] Sending to customer {message.customer_id}")
+        logger.info(f"[{self.channel.value}] Message: {message.message}")
+        message.provider_message_id = uuid.uuid4().hex
+        return True
+
+class FakeGateway(ChannelGateway):
+    """
+    Local stand-in with configurable latency and failure rate, for measuring
+    dispatcher throughput without a network
+    """
+
+    def __init__(
+        self,
+        channel: NotificationChannel,
+        latency_ms: float = 0,
+        failure_rate: float = 0.0,
+        max_batch_size: int = 1
+    ):
+        super().__init__(channel)
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.max_batch_size = max_batch_size
+
+    async def send(self, message: OutboundMessage) -> bool:
+        return (await self.send_batch([message]))[0]
+
+    async def send_batch(self, messages: List[OutboundMessage]) -> List[bool]:
+        # One round trip per call, however many recipients it carries
+        await asyncio.sleep(self.latency_ms / 1000)
+        results = []
+        for message in messages:
+            accepted = random.random() >= self.failure_rate
+            if accepted:
+                message.provider_message_id = uuid.uuid4().hex
+            results.append(accepted)
+        return results
+
+def build_gateways(gateway: Optional[str] = None) -> Dict[NotificationChannel, ChannelGateway]:
+    """
+    Gateways for every sending channel, chosen by NOTIFICATION_GATEWAY ("log" or "fake")
+    """
+    gateway = gateway or settings.NOTIFICATION_GATEWAY
+    if gateway == "fake":
+        return {
+            channel: FakeGateway(
+                channel,
+                latency_ms=settings.NOTIFICATION_FAKE_LATENCY_MS,
+                failure_rate=settings.NOTIFICATION_FAKE_FAILURE_RATE,
+                max_batch_size=settings.NOTIFICATION_FAKE_BATCH_SIZE
+            )
+            for channel in SEND_CHANNELS
+        }
+    return {channel: LoggingGateway(channel) for channel in SEND_CHANNELS}
+
+def channel_concurrency_limits() -> Dict[NotificationChannel, int]:
+    """
+    In-flight gateway calls allowed per channel
+    """
+    return {
+        NotificationChannel.SMS: settings.NOTIFICATION_SMS_CONCURRENCY,
+        NotificationChannel.EMAIL: settings.NOTIFICATION_EMAIL_CONCURRENCY,
+        NotificationChannel.APP: settings.NOTIFICATION_APP_CONCURRENCY
+    }
+
+class ChannelDispatcher:
+    """
+    Sends messages across channels concurrently:
+    1. Messages are grouped by channel and cut into provider-sized batches
+    2. Every gateway call first takes one rate-limit token per message, then
+       holds one of its channel's semaphore slots, so a slow channel cannot
+       starve the others or exceed its provider's limits
+    3. A gateway exception fails only the messages of that call
+    """
+
+    def __init__(
+        self,
+        gateways: Optional[Dict[NotificationChannel, ChannelGateway]] = None,
+        limits: Optional[Dict[NotificationChannel, int]] = None
+    ):
+        self.gateways = gateways or build_gateways()
+        self.limits = limits or channel_concurrency_limits()
+        self._semaphores: Dict[NotificationChannel, asyncio.Semaphore] = {}
+
+    def _semaphore(self, channel: NotificationChannel) -> asyncio.Semaphore:
+        # Created lazily so they belong to the loop that runs the dispatch
+        if channel not in self._semaphores:
+            self._semaphores[channel] = asyncio.Semaphore(max(1, self.limits.get(channel, 1)))
+        return self._semaphores[channel]
+
+    async def _send_call(self, channel: NotificationChannel, messages: List[OutboundMessage]) -> List[bool]:
+        gateway = self.gateways[channel]
+        # Quota tokens are taken before an in-flight slot, so waiting for the
+        # rate limit does not hold a connection slot
+        limiter = get_channel_limiter(channel)
+        if limiter:
+            await limiter.acquire_async(len(messages))
+        async with self._semaphore(channel):
+            try:
+                if len(messages) == 1:
+                    return [await gateway.send(messages[0])]
+                return await gateway.send_batch(messages)
+            except Exception as e:
+                logger.error(f"[{channel.value}] Gateway call for {len(messages)} messages failed: {str(e)}")
+                return [False] * len(messages)
+
+    async def dispatch(self, messages: List[OutboundMessage]) -> List[bool]:
+        """
+        Send all messages; results are returned in input order
+        """
+        positions: Dict[NotificationChannel, List[int]] = {}
+        for position, message in enumerate(messages):
+            positions.setdefault(message.channel, []).append(position)
+
+        calls = []
+        call_positions = []
+        for channel, channel_positions in positions.items():
+            batch_size = max(1, self.gateways[channel].max_batch_size)
+            for start in range(0, len(channel_positions), batch_size):
+                batch = channel_positions[start:start + batch_size]
+                calls.append(self._send_call(channel, [messages[p] for p in batch]))
+                call_positions.append(batch)
+
+        results = [False] * len(messages)
+        for batch, outcomes in zip(call_positions, await asyncio.gather(*calls)):
+            for position, outcome in zip(batch, outcomes):
+                results[position] = outcome
+        return results
+
+# Process-wide dispatcher for synchronous callers, with its loop in a daemon thread
+_shared_dispatcher: Optional[Tuple[asyncio.AbstractEventLoop, ChannelDispatcher]] = None
+_shared_dispatcher_lock = threading.Lock()
+
+def dispatch_blocking(messages: List[OutboundMessage]) -> List[bool]:
+    """
+    Send messages from synchronous code (inline dunning and curing sends) and
+    wait for the results
+    Every calling thread goes through the same ChannelDispatcher, so inline
+    sends share one set of per-channel in-flight limits
+    """
+    global _shared_dispatcher
+    with _shared_dispatcher_lock:
+        if _shared_dispatcher is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="channel-dispatcher", daemon=True).start()
+            _shared_dispatcher = (loop, ChannelDispatcher())
+        loop, dispatcher = _shared_dispatcher
+    return asyncio.run_coroutine_threadsafe(dispatcher.dispatch(messages), loop).result()
@@ -0,0 +1,244 @@
+"""
+Curing Jobs - Durable queue behind fast-ack payment webhooks
+With CURING_MODE=queued a webhook stores the payment and a curing job in one
+transaction and returns 202; curing workers drain the curing_jobs table
+
+Run as a separate worker:
+    python -m app.services.curing_jobs [--once]
+"""
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, exists, insert
+from sqlalchemy.orm import Session, aliased
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.curing_action import CuringAction
+from app.models.curing_job import CuringJob
+from app.models.payment import Payment
+from app.schemas.curing import CuringJobResponse
+from app.services.curing_service import CuringService
+from app.utils.enums import CuringJobStatus
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = (CuringJobStatus.QUEUED, CuringJobStatus.RUNNING)
+
+class CuringJobService:
+    """
+    Enqueues curing jobs and looks them up by payment transaction id
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, payment_id: int, customer_id: int) -> CuringJob:
+        """
+        Add a queued job in the caller's transaction (caller commits)
+        """
+        job = CuringJob(payment_id=payment_id, customer_id=customer_id, status=CuringJobStatus.QUEUED)
+        self.db.add(job)
+        self.db.flush()
+        return job
+
+    def enqueue_many(self, jobs: List[Tuple[int, int]]) -> Dict[int, int]:
+        """
+        Add queued jobs for (payment id, customer id) pairs with one multi-row
+        INSERT in the caller's transaction (caller commits)
+        Returns: job id by payment id
+        """
+        if not jobs:
+            return {}
+        self.db.execute(insert(CuringJob), [
+            {"payment_id": payment_id, "customer_id": customer_id, "status": CuringJobStatus.QUEUED}
+            for payment_id, customer_id in jobs
+        ])
+        return dict(self.db.query(CuringJob.payment_id, CuringJob.id).filter(
+            CuringJob.payment_id.in_([payment_id for payment_id, _ in jobs])
+        ).all())
+
+    def get_by_transaction_id(self, transaction_id: str) -> Optional[Tuple[CuringJob, str]]:
+        row = self.db.query(CuringJob, Payment.transaction_id).join(
+            Payment, Payment.id == CuringJob.payment_id
+        ).filter(Payment.transaction_id == transaction_id).first()
+        return (row[0], row[1]) if row else None
+
+    def build_response(self, job: CuringJob, transaction_id: str) -> CuringJobResponse:
+        return CuringJobResponse(
+            job_id=job.id,
+            transaction_id=transaction_id,
+            payment_id=job.payment_id,
+            customer_id=job.customer_id,
+            status=job.status,
+            attempts=job.attempts or 0,
+            result=job.result,
+            error_message=job.error_message,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at
+        )
+
+class CuringWorker:
+    """
+    Curing job consumer:
+    1. Claims QUEUED jobs that are first in line for their customer - no
+       earlier job of the same customer is QUEUED or RUNNING - with
+       FOR UPDATE SKIP LOCKED, and marks them RUNNING in a short transaction,
+       so payments of one customer are cured in arrival order while
+       different customers are cured by any number of workers in parallel
+    2. Cures each job in its own transaction; a payment that already has a
+       curing action (worker crashed after curing) is not cured twice
+    3. Requeues jobs left RUNNING by a crashed worker after CURING_JOB_STALE_SECONDS,
+       or fails them once they have used CURING_JOB_MAX_ATTEMPTS
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.batch_size = batch_size or settings.CURING_WORKER_BATCH_SIZE
+        self.poll_interval = settings.CURING_WORKER_POLL_INTERVAL if poll_interval is None else poll_interval
+
+    def requeue_stale(self, db: Session) -> int:
+        """
+        Recover jobs left RUNNING by a crashed worker or run
+        Jobs out of attempts are FAILED, so a job that keeps crashing cannot
+        block its customer's later payments; the rest are queued again
+        Returns: number of jobs requeued
+        """
+        stale_before = datetime.now() - timedelta(seconds=settings.CURING_JOB_STALE_SECONDS)
+        stale = and_(
+            CuringJob.status == CuringJobStatus.RUNNING,
+            CuringJob.started_at < stale_before
+        )
+        failed = db.query(CuringJob).filter(
+            stale,
+            CuringJob.attempts >= settings.CURING_JOB_MAX_ATTEMPTS
+        ).update({
+            CuringJob.status: CuringJobStatus.FAILED,
+            CuringJob.finished_at: datetime.now(),
+            CuringJob.error_message: f"Job did not finish after {settings.CURING_JOB_MAX_ATTEMPTS} attempts"
+        }, synchronize_session=False)
+        requeued = db.query(CuringJob).filter(stale).update(
+            {CuringJob.status: CuringJobStatus.QUEUED}, synchronize_session=False
+        )
+        db.commit()
+        if failed:
+            logger.error(f"Failed {failed} stale curing jobs that ran out of attempts")
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale curing jobs")
+        return requeued
+
+    def claim(self, db: Session) -> List[Tuple[int, int, int]]:
+        """
+        Lock and mark RUNNING the next jobs that are first in line for their customer
+        Returns: (job id, payment id, customer id) of every claimed job
+        """
+        earlier = aliased(CuringJob)
+        jobs = db.query(CuringJob).filter(
+            CuringJob.status == CuringJobStatus.QUEUED,
+            ~exists().where(and_(
+                earlier.customer_id == CuringJob.customer_id,
+                earlier.id < CuringJob.id,
+                earlier.status.in_(UNFINISHED_STATUSES)
+            ))
+        ).order_by(CuringJob.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+        now = datetime.now()
+        claimed = []
+        for job in jobs:
+            job.status = CuringJobStatus.RUNNING
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = now
+            claimed.append((job.id, job.payment_id, job.customer_id))
+        db.commit()
+        return claimed
+
+    def run_job(self, db: Session, job_id: int, payment_id: int, customer_id: int) -> bool:
+        """
+        Cure one claimed job and record its outcome
+        Returns: True if curing succeeded
+        """
+        already_cured = db.query(CuringAction.id).filter(CuringAction.payment_id == payment_id).first()
+        if already_cured:
+            result = {"success": True, "customer_id": customer_id, "message": "Payment already cured"}
+        else:
+            result = CuringService(db).execute_curing(customer_id, payment_id)
+
+        job = db.query(CuringJob).filter(CuringJob.id == job_id).first()
+        job.result = result
+        if result.get("success"):
+            job.status = CuringJobStatus.COMPLETED
+            job.error_message = None
+        elif result.get("error_type") == "UnexpectedError" and job.attempts < settings.CURING_JOB_MAX_ATTEMPTS:
+            # Still first in line for the customer, so ordering is kept
+            job.status = CuringJobStatus.QUEUED
+            job.error_message = result.get("message")
+        else:
+            job.status = CuringJobStatus.FAILED
+            job.error_message = result.get("message")
+        if job.status != CuringJobStatus.QUEUED:
+            job.finished_at = datetime.now()
+        db.commit()
+
+        logger.info(f"Curing job {job_id} for payment {payment_id}: {job.status.value}")
+        return job.status == CuringJobStatus.COMPLETED
+
+    def run_batch(self, db: Session) -> Dict[str, int]:
+        counts = {"completed": 0, "failed": 0}
+        for job_id, payment_id, customer_id in self.claim(db):
+            try:
+                succeeded = self.run_job(db, job_id, payment_id, customer_id)
+            except Exception as e:
+                # Left RUNNING - requeued (or failed, out of attempts) once it goes stale
+                logger.error(f"Curing job {job_id} crashed: {str(e)}")
+                db.rollback()
+                succeeded = False
+            counts["completed" if succeeded else "failed"] += 1
+        return counts
+
+    def run(self, once: bool = False, stop_event: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        Cure queued payments until the queue is empty (once=True) or until stopped
+        """
+        totals = {"completed": 0, "failed": 0}
+        db = SessionLocal()
+        try:
+            self.requeue_stale(db)
+            while not (stop_event and stop_event.is_set()):
+                counts = self.run_batch(db)
+                totals["completed"] += counts["completed"]
+                totals["failed"] += counts["failed"]
+
+                if counts["completed"] + counts["failed"]:
+                    db.expunge_all()
+                elif once:
+                    break
+                else:
+                    time.sleep(self.poll_interval)
+                    self.requeue_stale(db)
+        finally:
+            db.close()
+
+        return totals
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cure payments queued by fast-ack webhooks")
+    parser.add_argument("--once", action="store_true", help="Exit when no job is ready")
+    parser.add_argument("--batch-size", type=int, default=None, help="Jobs claimed per poll")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    worker = CuringWorker(args.batch_size)
+    try:
+        totals = worker.run(once=args.once)
+        logger.info(f"Curing worker finished: {totals['completed']} completed, {totals['failed']} failed")
+    except KeyboardInterrupt:
+        logger.info("Curing worker stopped")
+
+if __name__ == "__main__":
+    main()
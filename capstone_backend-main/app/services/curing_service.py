@@ -3,13 +3,14 @@ Curing Service - Handles service restoration after payment
 """
 import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from app.models.customer import Customer
 from app.models.payment import Payment
 from app.models.curing_action import CuringAction
 from app.utils.enums import DunningStatus, PaymentStatus
 from app.services.notification_service import NotificationService
+from app.services.customer_versioning import versioned_update
 from app.utils.exceptions import CustomerNotFoundException, NotificationFailedException
 
 from app.utils.exceptions import (
@@ -153,104 +154,139 @@ class CuringService:
         
         return message
     
-    def execute_curing(self, customer_id: int, payment_id: int) -> Dict[str, Any]:
+    def restore_customer(self, customer: Customer, payment: Payment) -> Tuple[DunningStatus, List[str], float, bool]:
+        """
+        Steps 6-9 of curing on the customer's current state, flushed as one versioned write
+        The payment always reduces the balance; services are only restored if
+        the customer is not already cured
+        Returns: (previous status, actions taken, remaining balance, already cured)
+        """
+        # Step 6: Check if already cured
+        previous_status = customer.dunning_status
+        already_cured = self.check_if_already_cured(customer)
+        
+        # Step 7: Restore services
+        if already_cured:
+            logger.info(f"Customer {customer.id} is already cured, applying payment to the balance")
+            actions_taken = ["Customer was already in ACTIVE status"]
+        else:
+            actions_taken = self.restore_services(customer, previous_status)
+        
+        # Step 8: Update financial details
+        payment_amount = float(payment.amount)
+        remaining_balance = self.calculate_remaining_balance(customer, payment_amount)
+        
+        customer.outstanding_amount = remaining_balance
+        customer.overdue_days = 0
+        
+        # Step 9: Update due dates if fully paid
+        if remaining_balance == 0:
+            customer.billing_date = None
+            customer.due_date = None
+            customer.next_action_date = None
+            actions_taken.append("Cleared billing and due dates (fully paid)")
+        
+        # Compare-and-swap on the customer's version before anything is sent
+        self.db.flush()
+        return previous_status, actions_taken, remaining_balance, already_cured
+    
+    def apply_curing(self, customer: Customer, payment: Payment) -> Dict[str, Any]:
+        """
+        Cure a loaded customer with a loaded payment, without committing
+        The customer's changes are flushed as a versioned write before the
+        confirmation is sent; if a concurrent payment or dunning run changed the
+        customer since it was read, it is re-read and cured on its current
+        status and balance, so neither update is lost
+        Raises: InvalidPaymentException, ConcurrentUpdateException
+        """
+        customer_id = customer.id
+        payment_id = payment.id
+        
+        # Step 3: Validate payment
+        self.validate_payment(payment)
+        
+        # Step 4: Check if payment belongs to customer
+        if payment.customer_id != customer_id:
+            raise InvalidPaymentException(
+                f"Payment {payment_id} does not belong to customer {customer_id}"
+            )
+        
+        # Steps 5-9: Versioned update of the customer (retried on a concurrent change)
+        previous_status, actions_taken, remaining_balance, already_cured = versioned_update(
+            self.db, customer, lambda: self.restore_customer(customer, payment)
+        )
+        payment_amount = float(payment.amount)
+        
+        # Step 10: Create curing action record
+        action_description = "; ".join(actions_taken)
+        curing_action = CuringAction(
+            customer_id=customer_id,
+            payment_id=payment_id,
+            previous_status=previous_status.value,
+            action_taken=action_description,
+            success_flag=True,
+            remarks=f"Payment: ₹{payment_amount:.2f}, Remaining: ₹{remaining_balance:.2f}"
+        )
+        self.db.add(curing_action)
+        
+        # Step 11: Send confirmation notifications
+        notifications_sent = self.notification_service.send_payment_confirmation(
+            customer, payment_amount, remaining_balance, commit=False
+        )
+        
+        logger.info(
+            f"✅ Curing completed: Customer {customer_id} | "
+            f"Status: {previous_status.value} → {customer.dunning_status.value} | "
+            f"Payment: ₹{payment_amount:.2f}"
+        )
+        
+        return {
+            "success": True,
+            "customer_id": customer_id,
+            "customer_name": customer.name,
+            "previous_status": previous_status.value,
+            "new_status": customer.dunning_status.value,
+            "payment_amount": payment_amount,
+            "remaining_balance": remaining_balance,
+            "actions_taken": actions_taken,
+            "notifications_sent": sum(notifications_sent.values()),
+            "notification_details": notifications_sent,
+            "message": "Payment applied, customer already active" if already_cured else "Service successfully restored"
+        }
+    
+    def execute_curing(
+        self,
+        customer_id: int,
+        payment_id: int,
+        customer: Optional[Customer] = None,
+        payment: Optional[Payment] = None
+    ) -> Dict[str, Any]:
         """
         Execute complete curing workflow with comprehensive error handling
+        Callers that already hold the customer and payment (payment ingestion)
+        pass them in to skip reloading them
         """
         try:
             # Step 1: Get customer with validation
-            customer = self.db.query(Customer).filter(Customer.id == customer_id).first()
+            if customer is None:
+                customer = self.db.query(Customer).filter(Customer.id == customer_id).first()
             if not customer:
                 raise CustomerNotFoundException(customer_id)
             
             # Step 2: Get payment with validation
-            payment = self.db.query(Payment).filter(Payment.id == payment_id).first()
+            if payment is None:
+                payment = self.db.query(Payment).filter(Payment.id == payment_id).first()
             if not payment:
                 raise PaymentNotFoundException(payment_id)
             
-            # Step 3: Validate payment
-            self.validate_payment(payment)
-            
-            # Step 4: Check if payment belongs to customer
-            if payment.customer_id != customer_id:
-                raise InvalidPaymentException(
-                    f"Payment {payment_id} does not belong to customer {customer_id}"
-                )
-            
-            # Step 5: Check if already cured
-            previous_status = customer.dunning_status
-            if self.check_if_already_cured(customer):
-                logger.warning(f"Customer {customer_id} is already cured")
-                # Don't raise exception, just return success with note
-                return {
-                    "success": True,
-                    "customer_id": customer_id,
-                    "customer_name": customer.name,
-                    "previous_status": previous_status.value,
-                    "new_status": DunningStatus.ACTIVE.value,
-                    "payment_amount": float(payment.amount),
-                    "remaining_balance": float(customer.outstanding_amount),
-                    "actions_taken": ["Customer was already in ACTIVE status"],
-                    "notifications_sent": 0,
-                    "message": "Customer already cured, no action needed"
-                }
+            # Steps 3-11
+            result = self.apply_curing(customer, payment)
             
-            # Step 6: Restore services
-            actions_taken = self.restore_services(customer, previous_status)
-            
-            # Step 7: Update financial details
-            payment_amount = float(payment.amount)
-            remaining_balance = self.calculate_remaining_balance(customer, payment_amount)
-            
-            customer.outstanding_amount = remaining_balance
-            customer.overdue_days = 0
-            
-            # Step 8: Update due dates if fully paid
-            if remaining_balance == 0:
-                customer.billing_date = None
-                customer.due_date = None
-                actions_taken.append("Cleared billing and due dates (fully paid)")
-            
-            # Step 9: Create curing action record
-            action_description = "; ".join(actions_taken)
-            curing_action = CuringAction(
-                customer_id=customer_id,
-                payment_id=payment_id,
-                previous_status=previous_status.value,
-                action_taken=action_description,
-                success_flag=True,
-                remarks=f"Payment: ₹{payment_amount:.2f}, Remaining: ₹{remaining_balance:.2f}"
-            )
-            self.db.add(curing_action)
-            
-            # Step 10: Send confirmation notifications
-            notifications_sent = self.notification_service.send_payment_confirmation(
-                customer, payment_amount, remaining_balance
-            )
-            
-            # Step 11: Commit all changes
+            # Step 12: Commit all changes in one transaction
             self.db.commit()
             self.db.refresh(customer)
             
-            logger.info(
-                f"✅ Curing completed: Customer {customer_id} | "
-                f"Status: {previous_status.value} → {customer.dunning_status.value} | "
-                f"Payment: ₹{payment_amount:.2f}"
-            )
-            
-            return {
-                "success": True,
-                "customer_id": customer_id,
-                "customer_name": customer.name,
-                "previous_status": previous_status.value,
-                "new_status": customer.dunning_status.value,
-                "payment_amount": payment_amount,
-                "remaining_balance": remaining_balance,
-                "actions_taken": actions_taken,
-                "notifications_sent": sum(notifications_sent.values()),
-                "notification_details": notifications_sent,
-                "message": "Service successfully restored"
-            }
+            return result
             
         except (CustomerNotFoundException, PaymentNotFoundException, InvalidPaymentException) as e:
             logger.error(f"Validation error in curing: {str(e)}")
@@ -270,6 +306,44 @@ class CuringService:
                 "error_type": "UnexpectedError",
                 "message": f"Curing failed: {str(e)}"
             }
+    
+    def execute_curing_batch(self, payments: List[Payment], customers: Dict[int, Customer]) -> List[Dict[str, Any]]:
+        """
+        Batched execute_curing for loaded payments and their customers
+        Payments are applied in list order on the same customer object, so each
+        payment of a customer reduces the balance left by the one before it (only
+        the first restores services), and the whole batch is committed once.
+        If the batch fails unexpectedly it is rolled back and every payment is
+        cured on its own with execute_curing
+        Returns one execute_curing style result per payment, in order
+        """
+        keys = [(payment.customer_id, payment.id) for payment in payments]
+        results = []
+        
+        try:
+            for payment in payments:
+                customer = customers.get(payment.customer_id)
+                try:
+                    if customer is None:
+                        raise CustomerNotFoundException(payment.customer_id)
+                    results.append(self.apply_curing(customer, payment))
+                except (CustomerNotFoundException, InvalidPaymentException) as e:
+                    logger.error(f"Validation error in curing: {str(e)}")
+                    results.append({
+                        "success": False,
+                        "customer_id": payment.customer_id,
+                        "error_type": type(e).__name__,
+                        "message": str(e)
+                    })
+            
+            self.db.commit()
+            
+        except Exception as e:
+            logger.error(f"Batch curing of {len(keys)} payments failed, curing one by one: {str(e)}")
+            self.db.rollback()
+            return [self.execute_curing(customer_id, payment_id) for customer_id, payment_id in keys]
+        
+        return results
             
     def process_payment_webhook(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
         """
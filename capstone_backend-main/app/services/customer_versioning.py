@@ -0,0 +1,45 @@
+"""
+Customer Versioning - Optimistic concurrency for customer balance and status updates
+customers.version is the mapper's version_id_col: every ORM UPDATE of a
+customer carries "WHERE version = <version read>" and bumps it, so a write
+based on a stale read raises StaleDataError instead of silently overwriting
+a concurrent payment or dunning run
+"""
+import logging
+from typing import Callable, TypeVar
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from app.config.settings import settings
+from app.models.customer import Customer
+from app.utils.exceptions import ConcurrentUpdateException
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def versioned_update(db: Session, customer: Customer, apply: Callable[[], T]) -> T:
+    """
+    Run apply() on a loaded customer inside a savepoint and flush its changes
+    1. The flush is the compare-and-swap: the customer's own UPDATE is checked
+       against the version read, and its row lock is only taken by that write
+    2. If another transaction changed the row meanwhile, the savepoint is
+       rolled back, the customer is re-read with SELECT ... FOR UPDATE (the
+       latest committed row, even inside a REPEATABLE READ snapshot) and
+       apply() runs again on the current balance and status
+    apply() must flush the customer before it sends anything, so nothing is
+    sent on a stale read
+    Raises: ConcurrentUpdateException after CUSTOMER_UPDATE_MAX_ATTEMPTS conflicts
+    """
+    customer_id = customer.id
+    for attempt in range(settings.CUSTOMER_UPDATE_MAX_ATTEMPTS):
+        savepoint = db.begin_nested()
+        try:
+            result = apply()
+            savepoint.commit()
+            return result
+        except StaleDataError:
+            savepoint.rollback()
+            logger.info(f"Customer {customer_id} changed concurrently (attempt {attempt + 1}), re-reading it")
+            db.refresh(customer, with_for_update=True)
+
+    raise ConcurrentUpdateException(customer_id)
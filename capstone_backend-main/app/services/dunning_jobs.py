@@ -0,0 +1,264 @@
+"""
+Dunning Jobs - Runs dunning executions in the background
+The API returns a job id at once; progress, results and cancellation go
+through the dunning_jobs / dunning_job_results tables
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.dunning_job import DunningJob
+from app.models.dunning_job_result import DunningJobResult
+from app.schemas.dunning import DunningExecutionRequest, DunningExecutionResult, DunningJobResponse
+from app.services.dunning_runner import DunningRunner
+from app.utils.enums import DunningJobStatus
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = (DunningJobStatus.COMPLETED, DunningJobStatus.FAILED, DunningJobStatus.CANCELLED)
+
+# Jobs run outside the request threadpool, a bounded number at a time
+_executor = ThreadPoolExecutor(max_workers=settings.DUNNING_JOB_THREADS, thread_name_prefix="dunning-job")
+
+class DunningJobService:
+    """
+    Creates, inspects and cancels background dunning jobs
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_job(self, request: Optional[DunningExecutionRequest] = None) -> DunningJob:
+        """
+        Record a queued job and hand it to the job executor
+        """
+        job = DunningJob(
+            status=DunningJobStatus.QUEUED,
+            request=request.model_dump() if request else None
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+
+        _executor.submit(run_job, job.id)
+        logger.info(f"Dunning job {job.id} queued")
+        return job
+
+    def get_job(self, job_id: int) -> Optional[DunningJob]:
+        return self.db.query(DunningJob).filter(DunningJob.id == job_id).first()
+
+    def get_results(self, job_id: int, skip: int = 0, limit: int = 100) -> Tuple[int, List[DunningExecutionResult]]:
+        """
+        Page through a job's per-customer results in processing order
+        Returns: (total result rows, page)
+        """
+        query = self.db.query(DunningJobResult).filter(DunningJobResult.job_id == job_id)
+        total = query.count()
+        rows = query.order_by(DunningJobResult.id).offset(skip).limit(limit).all()
+
+        return total, [
+            DunningExecutionResult(
+                customer_id=row.customer_id,
+                customer_name=row.customer_name or "Unknown",
+                overdue_days=row.overdue_days or 0,
+                rules_applied=row.rules_applied or 0,
+                actions_taken=row.actions_taken or [],
+                notifications_sent=row.notifications_sent or 0,
+                status=row.status,
+                message=row.message
+            )
+            for row in rows
+        ]
+
+    def request_cancel(self, job: DunningJob) -> DunningJob:
+        """
+        Flag a job for cancellation - the worker stops after its current batch
+        A job that has not started yet is cancelled immediately
+        """
+        job.cancel_requested = True
+        self.db.query(DunningJob).filter(
+            DunningJob.id == job.id,
+            DunningJob.status == DunningJobStatus.QUEUED
+        ).update({
+            DunningJob.status: DunningJobStatus.CANCELLED,
+            DunningJob.finished_at: datetime.now()
+        }, synchronize_session=False)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def build_response(self, job: DunningJob) -> DunningJobResponse:
+        """
+        Job status with throughput and remaining-time estimate
+        Rate counts only customers actually processed - unmatched customers
+        are skipped up front without being loaded
+        """
+        rate = None
+        eta_seconds = None
+
+        if job.started_at:
+            end = job.finished_at or datetime.now()
+            elapsed = (end - job.started_at).total_seconds()
+            worked = (job.processed or 0) - (job.unmatched_customers or 0)
+            if elapsed > 0:
+                rate = round(worked / elapsed, 2)
+            if job.status == DunningJobStatus.RUNNING and rate:
+                remaining = max((job.total_customers or 0) - (job.processed or 0), 0)
+                eta_seconds = round(remaining / rate, 1)
+
+        return DunningJobResponse(
+            job_id=job.id,
+            status=job.status,
+            total_customers=job.total_customers or 0,
+            processed=job.processed or 0,
+            successful=job.successful or 0,
+            failed=job.failed or 0,
+            skipped=job.skipped or 0,
+            rate=rate,
+            eta_seconds=eta_seconds,
+            cancel_requested=bool(job.cancel_requested),
+            error_message=job.error_message,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at
+        )
+
+def record_batch(db: Session, job: DunningJob, results: List[Dict[str, Any]]) -> None:
+    """
+    Store one batch of results and advance the job counters (caller commits)
+    """
+    db.add_all([
+        DunningJobResult(
+            job_id=job.id,
+            customer_id=r["customer_id"],
+            customer_name=r.get("customer_name"),
+            overdue_days=r.get("overdue_days", 0),
+            rules_applied=r.get("rules_applied", 0),
+            actions_taken=r.get("actions_taken", []),
+            notifications_sent=r.get("notifications_sent", 0),
+            status=r["status"],
+            message=r.get("message")
+        )
+        for r in results
+    ])
+
+    job.processed += len(results)
+    job.successful += sum(1 for r in results if r.get("status") == "SUCCESS")
+    job.failed += sum(1 for r in results if r.get("status") == "FAILED")
+    job.skipped += sum(1 for r in results if r.get("status") == "SKIPPED")
+
+def is_cancel_requested(db: Session, job_id: int) -> bool:
+    """
+    Re-read the cancel flag - it is set by another request's session
+    """
+    return bool(db.query(DunningJob.cancel_requested).filter(DunningJob.id == job_id).scalar())
+
+def run_job(job_id: int) -> None:
+    """
+    Execute a queued job on the job executor
+    The run and the job bookkeeping use separate sessions: the rule engine
+    expunges its session after every chunk
+    """
+    job_db = SessionLocal()
+    run_db = SessionLocal()
+    batches = None
+    try:
+        # Conditional claim - a job cancelled while queued is never started
+        claimed = job_db.query(DunningJob).filter(
+            DunningJob.id == job_id,
+            DunningJob.status == DunningJobStatus.QUEUED
+        ).update({
+            DunningJob.status: DunningJobStatus.RUNNING,
+            DunningJob.started_at: datetime.now()
+        }, synchronize_session=False)
+        job_db.commit()
+        if not claimed:
+            return
+
+        job = job_db.query(DunningJob).filter(DunningJob.id == job_id).first()
+
+        request = DunningExecutionRequest(**job.request) if job.request else None
+        runner = DunningRunner(run_db)
+        batches = runner.start(request)
+        # Don't hold the counting snapshot open for the whole run
+        run_db.commit()
+
+        # Unmatched customers are skipped without producing result rows
+        job.total_customers = runner.candidate_count + runner.unmatched_count
+        job.unmatched_customers = runner.unmatched_count
+        job.processed = runner.unmatched_count
+        job.skipped = runner.unmatched_count
+        job_db.commit()
+
+        for results in batches:
+            record_batch(job_db, job, results)
+            job_db.commit()
+
+            if is_cancel_requested(job_db, job_id):
+                logger.info(f"Dunning job {job_id} cancelled after {job.processed} customers")
+                job.status = DunningJobStatus.CANCELLED
+                break
+        else:
+            job.status = DunningJobStatus.COMPLETED
+
+        job.finished_at = datetime.now()
+        job_db.commit()
+        logger.info(
+            f"Dunning job {job_id} {job.status.value}: {job.successful} successful, "
+            f"{job.failed} failed, {job.skipped} skipped"
+        )
+
+    except Exception as e:
+        logger.error(f"Dunning job {job_id} failed: {str(e)}")
+        job_db.rollback()
+        run_db.rollback()
+        job = job_db.query(DunningJob).filter(DunningJob.id == job_id).first()
+        if job:
+            job.status = DunningJobStatus.FAILED
+            job.error_message = str(e)
+            job.finished_at = datetime.now()
+            job_db.commit()
+
+    finally:
+        if batches is not None:
+            # Stops an abandoned run and drops shards that have not started
+            batches.close()
+        run_db.close()
+        job_db.close()
+
+def recover_orphaned_jobs() -> None:
+    """
+    Settle jobs left behind by a restart (run at startup)
+    Jobs only live in the executor of the process that queued them:
+    1. RUNNING jobs were interrupted mid-run - they are marked FAILED and keep
+       the results recorded so far; the executed-rules ledger makes a new run safe
+    2. QUEUED jobs never started - they are handed to this process's executor,
+       whose conditional claim still lets only one worker start each
+    """
+    db = SessionLocal()
+    try:
+        failed = db.query(DunningJob).filter(
+            DunningJob.status == DunningJobStatus.RUNNING
+        ).update({
+            DunningJob.status: DunningJobStatus.FAILED,
+            DunningJob.error_message: "Interrupted by a restart before it finished",
+            DunningJob.finished_at: datetime.now()
+        }, synchronize_session=False)
+        db.commit()
+
+        queued = [job_id for (job_id,) in db.query(DunningJob.id).filter(
+            DunningJob.status == DunningJobStatus.QUEUED
+        ).order_by(DunningJob.id)]
+        for job_id in queued:
+            _executor.submit(run_job, job_id)
+
+        if failed or queued:
+            logger.warning(f"Recovered dunning jobs after restart: {failed} marked failed, {len(queued)} requeued")
+    except Exception as e:
+        logger.error(f"Dunning job recovery failed: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
@@ -0,0 +1,260 @@
+"""
+Dunning Runner - Orchestrates complete dunning executions
+Runs the rule engine in the request process or sharded across a process pool
+"""
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from queue import Empty
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.schemas.dunning import (
+    DunningExecutionRequest, DunningExecutionResponse, DunningExecutionResult
+)
+from app.services.rule_engine import RuleEngine
+
+logger = logging.getLogger(__name__)
+
+# How long the parent waits for a shard batch before checking for finished shards
+SHARD_POLL_SECONDS = 0.5
+
+def split_id_range(min_id: int, max_id: int, shards: int) -> List[Tuple[int, int]]:
+    """
+    Split an inclusive id range into at most `shards` contiguous ranges
+    """
+    span = max_id - min_id + 1
+    shards = max(1, min(shards, span))
+    step = -(-span // shards)  # ceiling division
+
+    ranges = []
+    start = min_id
+    while start <= max_id:
+        end = min(start + step - 1, max_id)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+def run_shard(
+    results_queue,
+    min_id: int,
+    max_id: int,
+    batch_size: Optional[int] = None,
+    force: bool = False
+) -> int:
+    """
+    Process one customer-id range in a worker process, putting each committed
+    batch's results on results_queue as soon as it is committed
+    Each worker imports the app fresh, so it has its own engine and SessionLocal
+    Returns: number of results sent
+    """
+    db = SessionLocal()
+    sent = 0
+    try:
+        rule_engine = RuleEngine(db, force=force)
+        for results in rule_engine.iter_process_overdue_chunks(batch_size, min_id=min_id, max_id=max_id):
+            results_queue.put(results)
+            sent += len(results)
+        return sent
+    finally:
+        db.close()
+
+def to_execution_result(result: Dict[str, Any]) -> DunningExecutionResult:
+    """
+    Convert one engine result dict into its API schema
+    """
+    return DunningExecutionResult(
+        customer_id=result["customer_id"],
+        customer_name=result.get("customer_name", "Unknown"),
+        overdue_days=result.get("overdue_days", 0),
+        rules_applied=result.get("rules_applied", 0),
+        actions_taken=result.get("actions_taken", []),
+        notifications_sent=result.get("notifications_sent", 0),
+        status=result["status"],
+        message=result.get("message")
+    )
+
+class DunningRunner:
+    """
+    Runs dunning for specific customers or the whole overdue population
+    and builds the execution summary
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        # Population of the last started run
+        self.candidate_count = 0
+        self.unmatched_count = 0
+
+    def build_response(
+        self,
+        results: List[Dict[str, Any]],
+        execution_time: float,
+        unmatched_count: int = 0
+    ) -> DunningExecutionResponse:
+        """
+        Convert engine result dicts into the execution response
+        unmatched_count: overdue customers no rule fired for - counted as skipped,
+        never loaded, so they have no per-customer result
+        """
+        successful = sum(1 for r in results if r.get("status") == "SUCCESS")
+        failed = sum(1 for r in results if r.get("status") == "FAILED")
+        skipped = sum(1 for r in results if r.get("status") == "SKIPPED") + unmatched_count
+
+        return DunningExecutionResponse(
+            total_customers=len(results) + unmatched_count,
+            successful=successful,
+            failed=failed,
+            skipped=skipped,
+            results=[to_execution_result(r) for r in results],
+            execution_time=execution_time
+        )
+
+    def iter_shard_results(self, workers: int, force: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Split the overdue population into id ranges and process them in a process pool
+        Yields every shard's commit batches as the workers commit them, so the
+        first results do not wait for a whole shard and no shard's full result
+        list is held here; batches of different shards interleave
+        """
+        bounds = RuleEngine(self.db, force=force).get_overdue_id_bounds()
+        if not bounds:
+            return
+
+        shards = split_id_range(bounds[0], bounds[1], workers * settings.DUNNING_SHARDS_PER_WORKER)
+        logger.info(f"Dunning run sharded into {len(shards)} id ranges across {workers} workers")
+
+        # End this session's read transaction - workers write through their own connections
+        self.db.commit()
+
+        # spawn (not fork) so no worker inherits the parent's pooled DB connections
+        context = multiprocessing.get_context("spawn")
+        manager = context.Manager()
+        results_queue = manager.Queue()
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        try:
+            pending = {
+                pool.submit(run_shard, results_queue, min_id, max_id, settings.DUNNING_BATCH_SIZE, force): (min_id, max_id)
+                for min_id, max_id in shards
+            }
+
+            while pending:
+                try:
+                    yield results_queue.get(timeout=SHARD_POLL_SECONDS)
+                    continue
+                except Empty:
+                    pass
+
+                # A worker puts its last batch before its future completes
+                for future in [future for future in pending if future.done()]:
+                    min_id, max_id = pending.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"Dunning shard {min_id}-{max_id} failed: {str(e)}")
+                        raise
+
+            while True:
+                try:
+                    yield results_queue.get_nowait()
+                except Empty:
+                    break
+        finally:
+            # A failed or abandoned run drops the shards that have not started
+            pool.shutdown(wait=True, cancel_futures=True)
+            manager.shutdown()
+
+    def start(self, request: Optional[DunningExecutionRequest] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Count the run's population, then return an iterator over committed
+        result batches (one per chunk, or per shard in sharded mode)
+        candidate_count / unmatched_count are set before this returns
+        """
+        force = bool(request and request.force)
+        rule_engine = RuleEngine(self.db, force=force)
+
+        if request and request.customer_ids:
+            self.candidate_count = len(request.customer_ids)
+            self.unmatched_count = 0
+            return self._iter_customer_batches(rule_engine, request.customer_ids)
+
+        # Counted before the run - executed actions may change balances and due dates
+        self.candidate_count, self.unmatched_count = rule_engine.count_overdue_customers()
+
+        workers = (request.workers if request and request.workers else None) or settings.DUNNING_WORKERS
+        if workers > 1:
+            return self.iter_shard_results(workers, force)
+
+        # Process all customers due for an action in this process
+        return rule_engine.iter_process_overdue_chunks()
+
+    def _iter_customer_batches(self, rule_engine: RuleEngine, customer_ids: List[int]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Process specific customers, one transaction each, in batches
+        """
+        batch_size = settings.DUNNING_BATCH_SIZE
+        for start in range(0, len(customer_ids), batch_size):
+            yield [rule_engine.process_customer(customer_id) for customer_id in customer_ids[start:start + batch_size]]
+
+    def run(self, request: Optional[DunningExecutionRequest] = None) -> DunningExecutionResponse:
+        """
+        Execute dunning and return the merged execution response
+        """
+        start_time = time.time()
+
+        results = []
+        for batch in self.start(request):
+            results.extend(batch)
+
+        return self.build_response(results, time.time() - start_time, self.unmatched_count)
+
+    def iter_ndjson(self, request: Optional[DunningExecutionRequest] = None) -> Iterator[str]:
+        """
+        Execute dunning as newline-delimited JSON:
+        one {"type": "result", ...} line per customer as soon as its batch is
+        committed, then one {"type": "summary", ...} line
+        Only the counters are kept, so memory does not grow with the run
+        """
+        start_time = time.time()
+        first_result_ms = None
+        counts = {"SUCCESS": 0, "FAILED": 0, "SKIPPED": 0}
+        processed = 0
+
+        for batch in self.start(request):
+            if first_result_ms is None and batch:
+                first_result_ms = round((time.time() - start_time) * 1000, 1)
+
+            lines = []
+            for r in batch:
+                counts[r["status"]] = counts.get(r["status"], 0) + 1
+                lines.append(json.dumps({"type": "result", **to_execution_result(r).model_dump()}) + "\n")
+            processed += len(batch)
+            yield "".join(lines)
+
+        yield json.dumps({
+            "type": "summary",
+            "total_customers": processed + self.unmatched_count,
+            "successful": counts["SUCCESS"],
+            "failed": counts["FAILED"],
+            "skipped": counts["SKIPPED"] + self.unmatched_count,
+            "execution_time": time.time() - start_time,
+            "time_to_first_result_ms": first_result_ms
+        }) + "\n"
+
+def stream_dunning_run(request: Optional[DunningExecutionRequest] = None) -> Iterator[str]:
+    """
+    NDJSON dunning run with a dedicated session (for StreamingResponse)
+    The request session may be closed before the body finishes streaming
+    """
+    db = SessionLocal()
+    try:
+        yield from DunningRunner(db).iter_ndjson(request)
+    except Exception as e:
+        logger.error(f"Streaming dunning run failed: {str(e)}")
+        db.rollback()
+        yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+    finally:
+        db.close()
@@ -0,0 +1,174 @@
+"""
+Dunning Scheduler - Maintains customers.next_action_date
+The next date on which some active rule fires for a customer, so a daily
+run only has to range-scan next_action_date <= today
+"""
+import logging
+from datetime import date, timedelta
+from typing import Dict, Any, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.customer import Customer
+from app.utils.enums import CustomerType
+from app.services.rule_index import rule_index
+
+logger = logging.getLogger(__name__)
+
+class DunningScheduler:
+    """
+    Computes and stores next_action_date from due_date, customer_type,
+    outstanding balance and the active rule set
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.rule_index = rule_index
+        self.rule_index.ensure_fresh(db)
+
+    def compute_next_action_date(
+        self,
+        customer_type: CustomerType,
+        due_date: Optional[date],
+        outstanding_amount: Any,
+        on_or_after: Optional[date] = None
+    ) -> Optional[date]:
+        """
+        First date >= on_or_after (default today) on which a rule triggers
+        None when nothing is owed or no remaining trigger day exists
+        """
+        if not due_date or not outstanding_amount or outstanding_amount <= 0:
+            return None
+
+        on_or_after = on_or_after or date.today()
+        trigger_days = self.rule_index.get_trigger_days().get(customer_type, set())
+
+        action_dates = [
+            due_date + timedelta(days=day)
+            for day in trigger_days
+            if day > 0 and due_date + timedelta(days=day) >= on_or_after
+        ]
+        return min(action_dates) if action_dates else None
+
+    def pending_from(self, next_action_date: Optional[date]) -> date:
+        """
+        Date a recomputed schedule starts from: today, or the stored
+        next_action_date if it is earlier - no run has processed the customer
+        since then, so trigger days from that date on are still pending
+        """
+        today = date.today()
+        return min(next_action_date, today) if next_action_date else today
+
+    def refresh_customer(self, customer: Customer, on_or_after: Optional[date] = None) -> Optional[date]:
+        """
+        Recompute next_action_date for a loaded customer (caller commits)
+        Without on_or_after it starts from the customer's pending date (pending_from)
+        """
+        customer.next_action_date = self.compute_next_action_date(
+            customer.customer_type,
+            customer.due_date,
+            customer.outstanding_amount,
+            on_or_after or self.pending_from(customer.next_action_date)
+        )
+        return customer.next_action_date
+
+    def rebuild(self, batch_size: Optional[int] = None, unscheduled_only: bool = False) -> Dict[str, int]:
+        """
+        Recompute next_action_date for every customer after a rule-set change
+        Walks the table in keyset chunks reading only the needed columns and
+        writes changed rows with one bulk UPDATE per chunk
+        Each customer is recomputed from its pending date (pending_from), so a
+        rebuild during or after a missed run does not skip unprocessed trigger days
+        unscheduled_only=True only backfills owing customers without a
+        next_action_date (loaded with plain SQL or before the column existed)
+        The UPDATE is versioned: if a payment or dunning run changed a customer
+        of the chunk since it was read, the chunk is rolled back and read again
+        """
+        batch_size = batch_size or settings.DUNNING_BATCH_SIZE
+        last_id = 0
+        scanned = 0
+        updated = 0
+        conflicts = 0
+        conditions = []
+        if unscheduled_only:
+            conditions = [
+                Customer.next_action_date.is_(None),
+                Customer.due_date.isnot(None),
+                Customer.outstanding_amount > 0
+            ]
+
+        while True:
+            rows = self.db.query(
+                Customer.id,
+                Customer.customer_type,
+                Customer.due_date,
+                Customer.outstanding_amount,
+                Customer.next_action_date,
+                Customer.version
+            ).filter(*conditions, Customer.id > last_id).order_by(Customer.id).limit(batch_size).all()
+
+            if not rows:
+                break
+
+            changes = []
+            for row in rows:
+                next_action_date = self.compute_next_action_date(
+                    row.customer_type, row.due_date, row.outstanding_amount,
+                    self.pending_from(row.next_action_date)
+                )
+                if next_action_date != row.next_action_date:
+                    changes.append({"id": row.id, "version": row.version, "next_action_date": next_action_date})
+
+            try:
+                if changes:
+                    self.db.execute(update(Customer), changes)
+                self.db.commit()
+            except StaleDataError:
+                self.db.rollback()
+                conflicts += 1
+                if conflicts >= settings.CUSTOMER_UPDATE_MAX_ATTEMPTS:
+                    raise
+                logger.info(f"Customers after id {last_id} changed during the schedule rebuild, re-reading the chunk")
+                continue
+            conflicts = 0
+
+            scanned += len(rows)
+            updated += len(changes)
+            last_id = rows[-1].id
+
+            if len(rows) < batch_size:
+                break
+
+        logger.info(f"Dunning schedule rebuilt: {scanned} customers scanned, {updated} updated")
+        return {"customers_scanned": scanned, "customers_updated": updated}
+
+def rebuild_schedule() -> None:
+    """
+    Rebuild the schedule with a dedicated session (for FastAPI BackgroundTasks)
+    """
+    db = SessionLocal()
+    try:
+        DunningScheduler(db).rebuild()
+    except Exception as e:
+        logger.error(f"Dunning schedule rebuild failed: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+def backfill_schedule() -> None:
+    """
+    Schedule owing customers that have no next_action_date yet (run at startup)
+    The daily run only selects next_action_date <= today, so they would never be picked up
+    """
+    db = SessionLocal()
+    try:
+        result = DunningScheduler(db).rebuild(unscheduled_only=True)
+        if result["customers_updated"]:
+            logger.info(f"Dunning schedule backfilled for {result['customers_updated']} customers")
+    except Exception as e:
+        logger.error(f"Dunning schedule backfill failed: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
@@ -0,0 +1,223 @@
+"""
+Notification Dispatcher - Sends outbox notifications
+Claims PENDING rows and FAILED rows whose retry is due in batches, sends
+them concurrently through the asyncio channel gateways and records the
+outcome, so dunning and curing never wait on a gateway
+
+Run as a separate worker:
+    python -m app.services.notification_dispatcher [--once]
+Dedicated workers for urgent notices (capacity no bulk backlog can take):
+    python -m app.services.notification_dispatcher --lane URGENT
+"""
+import argparse
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.notification import Notification
+from app.models.customer import Customer
+from app.services.notification_service import NotificationService
+from app.services.notification_templates import render_notification
+from app.services.channel_gateways import ChannelDispatcher, OutboundMessage, SEND_CHANNELS, build_gateways
+from app.utils.enums import NotificationChannel, NotificationStatus, NotificationLane
+
+logger = logging.getLogger(__name__)
+
+class NotificationDispatcher:
+    """
+    Outbox consumer:
+    1. Claims a batch of PENDING rows and FAILED rows whose next_attempt_at
+       has passed, with FOR UPDATE SKIP LOCKED, so any number of dispatchers
+       can run without sending a row twice
+    2. Fills the batch lane by lane - URGENT first, then STANDARD, and BULK
+       reminders only with the capacity left over
+    3. Sends the batch concurrently while holding the claim, within each
+       channel's in-flight limit; urgent messages take rate-limit tokens
+       and gateway slots first
+    4. Writes every outcome in the claiming transaction - failures get a
+       backed-off next_attempt_at or are dead-lettered; a crash before the
+       commit releases the rows unchanged
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        channel_dispatcher: Optional[ChannelDispatcher] = None,
+        lanes: Optional[Sequence[NotificationLane]] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.batch_size = batch_size or settings.NOTIFICATION_DISPATCH_BATCH_SIZE
+        self.channel_dispatcher = channel_dispatcher or ChannelDispatcher()
+        # Lanes served, most urgent first
+        self.lanes = [lane for lane in NotificationLane if lane in (lanes or list(NotificationLane))]
+        if poll_interval is None:
+            urgent_only = self.lanes == [NotificationLane.URGENT]
+            poll_interval = (
+                settings.NOTIFICATION_URGENT_POLL_INTERVAL if urgent_only
+                else settings.NOTIFICATION_DISPATCH_POLL_INTERVAL
+            )
+        self.poll_interval = poll_interval
+        # One loop for the dispatcher's lifetime, so gateway connections are reused
+        self.loop = asyncio.new_event_loop()
+
+    def build_messages(self, claimed) -> List[List[OutboundMessage]]:
+        """
+        Gateway messages for each claimed row - an ALL row fans out to every channel
+        """
+        messages = []
+        for notification, phone, email in claimed:
+            channel = NotificationChannel(notification.channel)
+            channels = SEND_CHANNELS if channel == NotificationChannel.ALL else (channel,)
+            # Template rows are rendered here, at dispatch time
+            text = render_notification(notification)
+            messages.append([
+                OutboundMessage(
+                    channel=send_channel,
+                    customer_id=notification.customer_id,
+                    phone=phone,
+                    email=email,
+                    message=text
+                )
+                for send_channel in channels
+            ])
+        return messages
+
+    def send_all(self, claimed) -> List[Tuple[bool, Optional[str]]]:
+        """
+        Send every claimed row concurrently; a row succeeds only if all of its
+        channel sends succeed
+        Returns: (success, provider message id) per row
+        """
+        per_row = self.build_messages(claimed)
+        flat = [message for row_messages in per_row for message in row_messages]
+        outcomes = self.loop.run_until_complete(self.channel_dispatcher.dispatch(flat))
+
+        results = []
+        position = 0
+        for row_messages in per_row:
+            success = all(outcomes[position:position + len(row_messages)])
+            results.append((success, row_messages[0].provider_message_id if success else None))
+            position += len(row_messages)
+        return results
+
+    def claim(self, db: Session, lane: NotificationLane, limit: int) -> List:
+        """
+        Lock up to `limit` sendable rows of one lane, oldest first
+        """
+        return db.query(Notification, Customer.phone, Customer.email).join(
+            Customer, Customer.id == Notification.customer_id
+        ).filter(
+            Notification.lane == lane,
+            or_(
+                Notification.status == NotificationStatus.PENDING,
+                and_(
+                    Notification.status == NotificationStatus.FAILED,
+                    Notification.next_attempt_at <= datetime.now()
+                )
+            )
+        ).order_by(Notification.id).limit(limit).with_for_update(
+            skip_locked=True, of=Notification
+        ).all()
+
+    def dispatch_batch(self, db: Session) -> Dict[str, int]:
+        """
+        Claim, send and settle one batch of pending or retry-due notifications
+        Returns: counts of delivered and failed notifications
+        """
+        claimed = []
+        for lane in self.lanes:
+            remaining = self.batch_size - len(claimed)
+            if remaining <= 0:
+                break
+            claimed.extend(self.claim(db, lane, remaining))
+
+        if not claimed:
+            db.commit()
+            return {"delivered": 0, "failed": 0}
+
+        notification_service = NotificationService(db)
+        started = time.time()
+        outcomes = self.send_all(claimed)
+        elapsed = time.time() - started
+        if elapsed > 0:
+            logger.info(f"Sent {len(claimed)} notifications in {elapsed:.3f}s ({len(claimed) / elapsed:.1f}/s)")
+
+        delivered = 0
+        for (notification, _, _), (success, provider_message_id) in zip(claimed, outcomes):
+            notification_service.mark_result(notification, success, provider_message_id=provider_message_id)
+            delivered += 1 if success else 0
+
+        db.commit()
+        return {"delivered": delivered, "failed": len(claimed) - delivered}
+
+    def run(self, once: bool = False, stop_event: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        Dispatch until the outbox is empty (once=True) or until stopped
+        Sleeps poll_interval when nothing is pending
+        """
+        totals = {"delivered": 0, "failed": 0}
+        db = SessionLocal()
+        try:
+            while not (stop_event and stop_event.is_set()):
+                try:
+                    counts = self.dispatch_batch(db)
+                except Exception as e:
+                    logger.error(f"Notification dispatch batch failed: {str(e)}")
+                    db.rollback()
+                    counts = {"delivered": 0, "failed": 0}
+                    if once:
+                        raise
+
+                totals["delivered"] += counts["delivered"]
+                totals["failed"] += counts["failed"]
+
+                if counts["delivered"] + counts["failed"]:
+                    logger.info(f"Dispatched {counts['delivered']} delivered, {counts['failed']} failed notifications")
+                    # Expunge the sent batch so the identity map stays small
+                    db.expunge_all()
+                elif once:
+                    break
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            db.close()
+
+        return totals
+
+    def close(self) -> None:
+        self.loop.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Send PENDING notifications and due retries")
+    parser.add_argument("--once", action="store_true", help="Exit when nothing is pending or due for retry")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows claimed per batch")
+    parser.add_argument("--gateway", choices=["log", "fake"], default=None, help="Gateway implementation (default: NOTIFICATION_GATEWAY)")
+    parser.add_argument("--lane", action="append", choices=[lane.value for lane in NotificationLane], help="Lane to serve (default: all, most urgent first)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    dispatcher = NotificationDispatcher(
+        args.batch_size,
+        ChannelDispatcher(build_gateways(args.gateway)),
+        lanes=[NotificationLane(lane) for lane in args.lane] if args.lane else None
+    )
+    try:
+        totals = dispatcher.run(once=args.once)
+        logger.info(f"Notification dispatcher finished: {totals['delivered']} delivered, {totals['failed']} failed")
+    except KeyboardInterrupt:
+        logger.info("Notification dispatcher stopped")
+    finally:
+        dispatcher.close()
+
+if __name__ == "__main__":
+    main()
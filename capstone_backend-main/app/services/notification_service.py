@@ -3,16 +3,35 @@ Enhanced Notification Service - Sprint 2
 Handles sending notifications via different channels with templates and retry logic
 """
 import logging
-from datetime import datetime
-from typing import List, Optional, Dict
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Sequence, Tuple, Union
+from sqlalchemy import insert, update, case
 from sqlalchemy.orm import Session
+from app.config.settings import settings
 from app.models.notification import Notification
 from app.models.customer import Customer
-from app.utils.enums import NotificationChannel, NotificationStatus
-from app.utils.exceptions import CustomerNotFoundException, NotificationFailedException
+from app.utils.enums import NotificationChannel, NotificationStatus, NotificationLane, DeliveryReceiptStatus, ActionType
+from app.services.channel_gateways import OutboundMessage, SEND_CHANNELS, dispatch_blocking
+from app.services.notification_templates import TemplateRef, template_registry
 
 logger = logging.getLogger(__name__)
 
+def rule_lane(action_type: ActionType, priority: int) -> NotificationLane:
+    """
+    Dispatch lane for a dunning rule's notifications:
+    barring and deactivation notices, and rules at or above
+    NOTIFICATION_URGENT_RULE_PRIORITY, are URGENT; throttling notices are
+    STANDARD; plain reminders are BULK
+    """
+    if action_type in (ActionType.BAR_OUTGOING, ActionType.DEACTIVATE):
+        return NotificationLane.URGENT
+    if (priority or 0) >= settings.NOTIFICATION_URGENT_RULE_PRIORITY:
+        return NotificationLane.URGENT
+    if action_type == ActionType.THROTTLE:
+        return NotificationLane.STANDARD
+    return NotificationLane.BULK
+
 class NotificationService:
     """
     Enhanced service for sending notifications with templates and error handling
@@ -20,200 +39,249 @@ class NotificationService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.max_retries = 3
+        # Send attempts per notification; failures are retried later by the dispatcher
+        self.max_attempts = settings.NOTIFICATION_MAX_ATTEMPTS
     
-    def get_notification_template(self, template_type: str, **kwargs) -> str:
-        """
-        Generate notification message from templates
+    def retry_delay(self, attempt_count: int) -> float:
         """
-        templates = {
-            "payment_reminder": (
-                "Dear {name}, your bill of ₹{amount:.2f} is overdue by {days} days. "
-                "Please pay to avoid service disruption. Due date: {due_date}"
-            ),
-            "data_throttle": (
-                "Dear {name}, due to payment delay of {days} days, your data speed has been reduced. "
-                "Outstanding: ₹{amount:.2f}. Pay now to restore full speed."
-            ),
-            "service_barred": (
-                "URGENT: {name}, your outgoing services have been barred due to {days} days overdue payment. "
-                "Amount: ₹{amount:.2f}. Pay immediately to restore services."
-            ),
-            "final_notice": (
-                "FINAL NOTICE: {name}, your service will be suspended. "
-                "Outstanding: ₹{amount:.2f} for {days} days. Immediate payment required."
-            ),
-            "payment_success": (
-                "Dear {name}, thank you for your payment of ₹{amount:.2f}. "
-                "{message}"
-            ),
-            "service_restored": (
-                "Dear {name}, your payment of ₹{amount:.2f} has been received. "
-                "All services have been restored. Thank you!"
-            )
-        }
-        
-        template = templates.get(template_type, "Notification: {message}")
-        try:
-            return template.format(**kwargs)
-        except KeyError as e:
-            logger.error(f"Missing template parameter: {e}")
-            return f"Notification message for {kwargs.get('name', 'customer')}"
-    
-    def send_sms(self, phone: str, message: str, retry: int = 0) -> bool:
+        Seconds before the next attempt: exponential backoff with jitter
+        Half the delay is fixed and half random, so failures from one outage
+        spread out instead of retrying in lockstep
         """
-        Simulate sending SMS with retry logic
-        """
-        try:
-            logger.info(f"[SMS] Attempt {retry + 1}/{self.max_retries} - Sending to {phone}")
-            logger.info(f"[SMS] Message: {message}")
-            
-            # Simulate SMS gateway call
-            # In production: integrate with Twilio, AWS SNS, etc.
-            # response = sms_gateway.send(phone, message)
-            
-            return True
-        except Exception as e:
-            logger.error(f"[SMS] Failed to send to {phone}: {str(e)}")
-            if retry < self.max_retries - 1:
-                return self.send_sms(phone, message, retry + 1)
-            return False
+        delay = min(
+            settings.NOTIFICATION_RETRY_MAX_SECONDS,
+            settings.NOTIFICATION_RETRY_BASE_SECONDS * (2 ** max(attempt_count - 1, 0))
+        )
+        return delay / 2 + random.uniform(0, delay / 2)
     
-    def send_email(self, email: str, subject: str, message: str, retry: int = 0) -> bool:
+    def mark_result(
+        self,
+        notification: Notification,
+        success: bool,
+        error: Optional[str] = None,
+        provider_message_id: Optional[str] = None
+    ) -> None:
         """
-        Simulate sending email with retry logic
+        Record a send attempt on the notification row
+        A failed attempt is scheduled for retry, or dead-lettered after the last one
+        With NOTIFICATION_DELIVERY_RECEIPTS an accepted message that has a provider
+        message id stays SENT until its delivery receipt arrives
         """
-        try:
-            logger.info(f"[EMAIL] Attempt {retry + 1}/{self.max_retries} - Sending to {email}")
-            logger.info(f"[EMAIL] Subject: {subject}")
-            logger.info(f"[EMAIL] Message: {message}")
-            
-            # Simulate email service call
-            # In production: integrate with SendGrid, AWS SES, etc.
-            # response = email_service.send(email, subject, message)
-            
-            return True
-        except Exception as e:
-            logger.error(f"[EMAIL] Failed to send to {email}: {str(e)}")
-            if retry < self.max_retries - 1:
-                return self.send_email(email, subject, message, retry + 1)
-            return False
+        channel = NotificationChannel(notification.channel).value
+        notification.attempt_count = (notification.attempt_count or 0) + 1
+        
+        if success:
+            if provider_message_id and settings.NOTIFICATION_DELIVERY_RECEIPTS:
+                notification.status = NotificationStatus.SENT.value
+            else:
+                notification.status = NotificationStatus.DELIVERED.value
+            notification.provider_message_id = provider_message_id
+            notification.sent_at = datetime.now()
+            notification.next_attempt_at = None
+            logger.info(f"✅ Notification sent successfully via {channel} to customer {notification.customer_id}")
+            return
+        
+        notification.last_error = error or f"{channel} gateway did not accept the message"
+        if notification.attempt_count >= self.max_attempts:
+            notification.status = NotificationStatus.DEAD_LETTER.value
+            notification.next_attempt_at = None
+            logger.error(
+                f"☠️ Notification {notification.id} via {channel} to customer {notification.customer_id} "
+                f"dead-lettered after {notification.attempt_count} attempts"
+            )
+        else:
+            delay = self.retry_delay(notification.attempt_count)
+            notification.status = NotificationStatus.FAILED.value
+            notification.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+            logger.warning(
+                f"❌ Notification failed via {channel} to customer {notification.customer_id} "
+                f"(attempt {notification.attempt_count}/{self.max_attempts}, retry in {delay:.0f}s)"
+            )
     
-    def send_app_notification(self, customer_id: int, message: str, retry: int = 0) -> bool:
+    def fan_out(
+        self,
+        customer: Customer,
+        channels: Sequence[NotificationChannel],
+        message: Union[str, TemplateRef],
+        rule_id: Optional[int] = None,
+        commit: bool = False,
+        lane: NotificationLane = NotificationLane.STANDARD
+    ) -> List[Notification]:
         """
-        Simulate sending in-app notification with retry logic
+        Notify an already loaded customer on several channels at once
+        1. Inline mode sends to all channels concurrently through the channel
+           gateways (dispatch_blocking), outbox mode sends nothing
+        2. All rows are written with one multi-row INSERT (no per-row flush or refresh)
+        3. A TemplateRef message is stored as template id and parameters, not text
+        4. lane orders the rows in the outbox dispatcher (see rule_lane)
+        Returns transient Notification objects describing the rows written
+        (ids are not fetched); with commit=False the caller owns the transaction
         """
-        try:
-            logger.info(f"[APP] Attempt {retry + 1}/{self.max_retries} - Sending to customer {customer_id}")
-            logger.info(f"[APP] Message: {message}")
+        if isinstance(message, TemplateRef):
+            template_id, template_params, text = message.template_id, message.params, None
+        else:
+            template_id, template_params, text = None, None, message
+        
+        notifications = [
+            Notification(
+                customer_id=customer.id,
+                rule_id=rule_id,
+                channel=channel.value,
+                message=text,
+                template_id=template_id,
+                template_params=template_params,
+                status=NotificationStatus.PENDING.value,
+                lane=lane.value,
+                attempt_count=0
+            )
+            for channel in channels
+        ]
+        
+        if settings.NOTIFICATION_DISPATCH_MODE == "outbox":
+            logger.info(f"{len(notifications)} notifications queued for customer {customer.id}")
+        else:
+            # Rendered once for every channel, never stored
+            if text is None:
+                text = message.render()
             
-            # Simulate push notification service
-            # In production: integrate with Firebase, OneSignal, etc.
-            # response = push_service.send(customer_id, message)
+            # Sent concurrently through the shared channel dispatcher; a failed
+            # send is queued for retry instead of failing the caller
+            messages = [
+                OutboundMessage(
+                    channel=channel,
+                    customer_id=customer.id,
+                    phone=customer.phone,
+                    email=customer.email,
+                    message=text
+                )
+                for channel in channels
+            ]
+            try:
+                outcomes = dispatch_blocking(messages)
+            except Exception as e:
+                logger.error(f"Exception in notification sending: {str(e)}")
+                outcomes = [False] * len(messages)
             
-            return True
-        except Exception as e:
-            logger.error(f"[APP] Failed to send to customer {customer_id}: {str(e)}")
-            if retry < self.max_retries - 1:
-                return self.send_app_notification(customer_id, message, retry + 1)
-            return False
+            for notification, outbound, success in zip(notifications, messages, outcomes):
+                self.mark_result(notification, success, provider_message_id=outbound.provider_message_id)
+        
+        self.db.execute(insert(Notification), [
+            {
+                "customer_id": n.customer_id,
+                "rule_id": n.rule_id,
+                "channel": n.channel,
+                "message": n.message,
+                "template_id": n.template_id,
+                "template_params": n.template_params,
+                "status": n.status,
+                "lane": n.lane,
+                "sent_at": n.sent_at,
+                "attempt_count": n.attempt_count,
+                "next_attempt_at": n.next_attempt_at,
+                "last_error": n.last_error,
+                "provider_message_id": n.provider_message_id
+            }
+            for n in notifications
+        ])
+        
+        if commit:
+            self.db.commit()
+        
+        return notifications
     
-    def create_and_send_notification(
+    def apply_delivery_receipts(
         self,
-        customer_id: int,
-        channel: NotificationChannel,
-        message: str,
-        rule_id: Optional[int] = None
-    ) -> Notification:
+        receipts: List[Tuple[str, DeliveryReceiptStatus, Optional[str]]]
+    ) -> Dict[str, int]:
         """
-        Create notification record and send it via specified channel with error handling
+        Apply a batch of provider delivery receipts (provider message id, status, error)
+        1. Receipts are grouped by (status, error) and each group is applied with
+           set-based UPDATEs of up to NOTIFICATION_RECEIPT_CHUNK_SIZE ids
+        2. DELIVERED is final; FAILED only applies to rows still awaiting a
+           receipt and schedules a retry, or dead-letters the row after its last attempt
+        3. Receipts for unknown ids, duplicates and stale receipts are ignored
+        Returns: counts of received, updated and ignored receipts
         """
-        # Get customer details with error handling
-        customer = self.db.query(Customer).filter(Customer.id == customer_id).first()
-        if not customer:
-            raise CustomerNotFoundException(customer_id)
+        # The last receipt for a message id wins
+        latest: Dict[str, Tuple[DeliveryReceiptStatus, Optional[str]]] = {}
+        for provider_message_id, status, error in receipts:
+            latest[provider_message_id] = (status, error)
         
-        # Create notification record
-        notification = Notification(
-            customer_id=customer_id,
-            rule_id=rule_id,
-            channel=channel.value,
-            message=message,
-            status=NotificationStatus.PENDING.value
-        )
-        self.db.add(notification)
-        self.db.flush()
+        groups: Dict[Tuple[DeliveryReceiptStatus, Optional[str]], List[str]] = {}
+        for provider_message_id, key in latest.items():
+            groups.setdefault(key, []).append(provider_message_id)
         
-        # Send notification based on channel
-        success = False
-        try:
-            if channel == NotificationChannel.SMS:
-                success = self.send_sms(customer.phone, message)
-            elif channel == NotificationChannel.EMAIL:
-                subject = "Payment Reminder - Dunning Notice"
-                success = self.send_email(customer.email, subject, message)
-            elif channel == NotificationChannel.APP:
-                success = self.send_app_notification(customer_id, message)
-            elif channel == NotificationChannel.ALL:
-                # Send via all channels
-                sms_success = self.send_sms(customer.phone, message)
-                email_success = self.send_email(customer.email, "Payment Reminder", message)
-                app_success = self.send_app_notification(customer_id, message)
-                success = sms_success and email_success and app_success
-            
-            # Update notification status
-            if success:
-                notification.status = NotificationStatus.DELIVERED.value
-                notification.sent_at = datetime.now()
-                logger.info(f"✅ Notification sent successfully via {channel.value} to customer {customer_id}")
-            else:
-                notification.status = NotificationStatus.FAILED.value
-                logger.warning(f"❌ Notification failed via {channel.value} to customer {customer_id}")
-                
-        except Exception as e:
-            notification.status = NotificationStatus.FAILED.value
-            logger.error(f"Exception in notification sending: {str(e)}")
-            raise NotificationFailedException(channel.value, customer_id)
+        now = datetime.now()
+        chunk_size = settings.NOTIFICATION_RECEIPT_CHUNK_SIZE
+        updated = 0
+        
+        for (status, error), ids in groups.items():
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                if status == DeliveryReceiptStatus.DELIVERED:
+                    statement = update(Notification).where(
+                        Notification.provider_message_id.in_(chunk),
+                        Notification.status != NotificationStatus.DELIVERED
+                    ).values(
+                        status=NotificationStatus.DELIVERED,
+                        next_attempt_at=None,
+                        last_error=None
+                    )
+                else:
+                    # Fixed base delay - per-row jitter is left to the send path
+                    last_attempt = Notification.attempt_count >= self.max_attempts
+                    statement = update(Notification).where(
+                        Notification.provider_message_id.in_(chunk),
+                        Notification.status == NotificationStatus.SENT
+                    ).values(
+                        status=case(
+                            (last_attempt, NotificationStatus.DEAD_LETTER.value),
+                            else_=NotificationStatus.FAILED.value
+                        ),
+                        next_attempt_at=case(
+                            (last_attempt, None),
+                            else_=now + timedelta(seconds=settings.NOTIFICATION_RETRY_BASE_SECONDS)
+                        ),
+                        last_error=error or "Provider reported delivery failure"
+                    )
+                updated += self.db.execute(statement.execution_options(synchronize_session=False)).rowcount
         
         self.db.commit()
-        self.db.refresh(notification)
         
-        return notification
+        logger.info(f"Applied {updated} of {len(receipts)} delivery receipts")
+        return {"received": len(receipts), "updated": updated, "ignored": len(receipts) - updated}
     
     def send_payment_confirmation(
         self,
         customer: Customer,
         payment_amount: float,
-        remaining_balance: float
+        remaining_balance: float,
+        commit: bool = True
     ) -> Dict[str, int]:
         """
         Send payment confirmation notifications via all channels
         """
         if remaining_balance > 0:
-            message = self.get_notification_template(
-                "payment_success",
+            message = template_registry.ref(
+                "payment_partial",
                 name=customer.name,
-                amount=payment_amount,
-                message=f"Remaining balance: ₹{remaining_balance:.2f}. Please clear to avoid future disruptions."
+                amount=float(payment_amount),
+                remaining=float(remaining_balance)
             )
         else:
-            message = self.get_notification_template(
+            message = template_registry.ref(
                 "service_restored",
                 name=customer.name,
-                amount=payment_amount
+                amount=float(payment_amount)
             )
         
         notifications_sent = {"sms": 0, "email": 0, "app": 0}
         
-        for channel in [NotificationChannel.SMS, NotificationChannel.EMAIL, NotificationChannel.APP]:
-            try:
-                self.create_and_send_notification(
-                    customer_id=customer.id,
-                    channel=channel,
-                    message=message
-                )
-                notifications_sent[channel.value.lower()] = 1
-            except Exception as e:
-                logger.error(f"Failed to send {channel.value} confirmation: {str(e)}")
+        try:
+            notifications = self.fan_out(customer, SEND_CHANNELS, message, commit=commit)
+            for notification in notifications:
+                notifications_sent[NotificationChannel(notification.channel).value.lower()] = 1
+        except Exception as e:
+            logger.error(f"Failed to send payment confirmation: {str(e)}")
         
         return notifications_sent
@@ -0,0 +1,154 @@
+"""
+Notification Templates - Versioned, precompiled message templates
+Notifications store a template id and a small parameter payload instead of
+the rendered text; the message is rendered when it is sent or read
+"""
+import logging
+from dataclasses import dataclass, field
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Template id of a message joining several templates (coalesced notifications)
+COMPOSITE_TEMPLATE_ID = "composite.v1"
+
+class NotificationTemplate:
+    """
+    A registered template, parsed once into literal text and fields
+    Ids carry their version ("dunning.throttle.v1") and a registered text
+    never changes - rewording a message means registering the next version,
+    so rows written earlier keep rendering exactly as they were sent
+    """
+
+    def __init__(self, template_id: str, text: str):
+        self.template_id = template_id
+        self.text = text
+        self._parts: List[Tuple[str, Optional[str], str]] = [
+            (literal, field_name, format_spec or "")
+            for literal, field_name, format_spec, _ in Formatter().parse(text)
+        ]
+
+    def render(self, params: Dict[str, Any]) -> str:
+        pieces = []
+        for literal, field_name, format_spec in self._parts:
+            pieces.append(literal)
+            if field_name is not None:
+                pieces.append(format(params[field_name], format_spec))
+        return "".join(pieces)
+
+@dataclass(frozen=True)
+class TemplateRef:
+    """
+    What a notification row stores: a template id and its parameters
+    """
+    template_id: str
+    params: Dict[str, Any] = field(default_factory=dict, hash=False)
+
+    def render(self) -> str:
+        return template_registry.render(self.template_id, self.params)
+
+    @classmethod
+    def combine(cls, refs: List["TemplateRef"]) -> "TemplateRef":
+        """
+        One message rendering each ref in order, separated by a blank line
+        """
+        if len(refs) == 1:
+            return refs[0]
+        return cls(COMPOSITE_TEMPLATE_ID, {"parts": [[ref.template_id, ref.params] for ref in refs]})
+
+class TemplateRegistry:
+    """
+    Templates by id, plus the latest version of each template name
+    """
+
+    def __init__(self):
+        self._templates: Dict[str, NotificationTemplate] = {}
+        self._latest: Dict[str, str] = {}
+
+    def register(self, name: str, version: int, text: str) -> str:
+        template_id = f"{name}.v{version}"
+        if template_id in self._templates and self._templates[template_id].text != text:
+            raise ValueError(f"Template {template_id} is already registered with different text")
+        self._templates[template_id] = NotificationTemplate(template_id, text)
+
+        latest = self._latest.get(name)
+        if latest is None or version > int(latest.rsplit(".v", 1)[1]):
+            self._latest[name] = template_id
+        return template_id
+
+    def latest(self, name: str) -> Optional[str]:
+        """
+        Id of the newest version of a template name
+        """
+        return self._latest.get(name)
+
+    def ref(self, template_name: str, **params) -> TemplateRef:
+        """
+        Reference to the newest version of a template, with its parameters
+        """
+        template_id = self._latest.get(template_name)
+        if template_id is None:
+            raise KeyError(f"Unknown notification template: {template_name}")
+        return TemplateRef(template_id, params)
+
+    def render(self, template_id: str, params: Optional[Dict[str, Any]]) -> str:
+        params = params or {}
+        if template_id == COMPOSITE_TEMPLATE_ID:
+            return "\n\n".join(self.render(part_id, part_params) for part_id, part_params in params["parts"])
+
+        template = self._templates.get(template_id)
+        if template is None:
+            raise KeyError(f"Unknown notification template: {template_id}")
+        return template.render(params)
+
+template_registry = TemplateRegistry()
+
+# Dunning rule messages (RuleEngine)
+template_registry.register("dunning.notify", 1, (
+    "Dear {name}, your bill of ₹{amount:.2f} "
+    "is overdue by {days} days. Please pay to avoid service disruption. "
+    "Due date was: {due_date}"
+))
+template_registry.register("dunning.throttle", 1, (
+    "Dear {name}, due to payment delay of {days} days, "
+    "your data speed has been reduced. Outstanding: ₹{amount:.2f}. "
+    "Pay now to restore full speed."
+))
+template_registry.register("dunning.bar_outgoing", 1, (
+    "URGENT: {name}, your outgoing services have been barred due to "
+    "{days} days overdue payment of ₹{amount:.2f}. "
+    "Pay immediately to restore services."
+))
+template_registry.register("dunning.deactivate", 1, (
+    "FINAL NOTICE: {name}, your service has been suspended due to "
+    "non-payment for {days} days. Outstanding: ₹{amount:.2f}. "
+    "Immediate payment required to avoid disconnection."
+))
+template_registry.register("dunning.reminder", 1, "Payment reminder for ₹{amount:.2f}")
+
+# Payment confirmation messages (NotificationService)
+template_registry.register("payment_success", 1, (
+    "Dear {name}, thank you for your payment of ₹{amount:.2f}. "
+    "{message}"
+))
+template_registry.register("payment_partial", 1, (
+    "Dear {name}, thank you for your payment of ₹{amount:.2f}. "
+    "Remaining balance: ₹{remaining:.2f}. Please clear to avoid future disruptions."
+))
+template_registry.register("service_restored", 1, (
+    "Dear {name}, your payment of ₹{amount:.2f} has been received. "
+    "All services have been restored. Thank you!"
+))
+
+def render_notification(notification) -> str:
+    """
+    Text of a notification row - stored text, or rendered from its template
+    """
+    if notification.message is not None or not notification.template_id:
+        return notification.message or ""
+    try:
+        return template_registry.render(notification.template_id, notification.template_params)
+    except (KeyError, ValueError, TypeError) as e:
+        logger.error(f"Cannot render notification {notification.id} ({notification.template_id}): {str(e)}")
+        return ""
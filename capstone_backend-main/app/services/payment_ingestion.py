@@ -0,0 +1,307 @@
+"""
+Payment Ingestion - Idempotent, insert-first recording of gateway payments
+Shared by /payments/webhook and /payment-success: the unique transaction_id
+decides whether a callback is new, so retried callbacks cost one INSERT
+that does nothing plus one SELECT, and concurrent retries cannot race
+/payments/webhook/batch records many callbacks with a few set-based statements
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.customer import Customer
+from app.models.payment import Payment
+from app.schemas.payment import PaymentWebhook
+from app.utils.enums import PaymentMethod, PaymentStatus
+from app.utils.exceptions import CustomerNotFoundException, InvalidPaymentException
+from app.services.curing_jobs import CuringJobService
+from app.services.curing_service import CuringService
+
+logger = logging.getLogger(__name__)
+
+# Shared by all requests - one session per partition of a batch's customers
+_curing_executor = ThreadPoolExecutor(
+    max_workers=settings.PAYMENT_BATCH_CURING_THREADS,
+    thread_name_prefix="payment-curing"
+)
+
+@dataclass
+class IngestedPayment:
+    """
+    The stored payment for a transaction id and the customer it belongs to
+    created is False when the transaction was already recorded
+    curing_job_id is set when the payment was queued for a curing worker
+    """
+    payment: Payment
+    customer: Customer
+    created: bool
+    curing_job_id: Optional[int] = None
+
+def parse_payment_method(value: str) -> PaymentMethod:
+    try:
+        return PaymentMethod(value.upper())
+    except ValueError:
+        raise InvalidPaymentException(f"Unknown payment method '{value}'")
+
+def webhook_payment_status(webhook_data: PaymentWebhook) -> PaymentStatus:
+    return PaymentStatus.SUCCESS if webhook_data.status.lower() == "success" else PaymentStatus.FAILED
+
+def cure_payments(payment_ids: List[int], db: Optional[Session] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Cure payments in the given order with CuringService.execute_curing_batch
+    Loads the payments and their customers with one query each; without a
+    session a new one is opened (worker threads)
+    Returns: curing result by payment id
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        by_id = {payment.id: payment for payment in db.query(Payment).filter(Payment.id.in_(payment_ids))}
+        payment_ids = [payment_id for payment_id in payment_ids if payment_id in by_id]
+        customers = {
+            customer.id: customer for customer in
+            db.query(Customer).filter(Customer.id.in_({by_id[payment_id].customer_id for payment_id in payment_ids}))
+        }
+        results = CuringService(db).execute_curing_batch([by_id[payment_id] for payment_id in payment_ids], customers)
+        return dict(zip(payment_ids, results))
+    finally:
+        if own_session:
+            db.close()
+
+class PaymentIngestionService:
+    """
+    Records a gateway payment in two statements:
+    1. INSERT that skips an existing transaction_id - INSERT IGNORE on MySQL,
+       a savepoint around a plain INSERT elsewhere
+    2. One SELECT of the stored payment joined to its customer, which serves
+       new and duplicate callbacks alike
+    A callback for an unknown customer fails the foreign key (downgraded to a
+    warning by INSERT IGNORE, rolled back with the savepoint elsewhere), so
+    nothing is stored and the SELECT finds no row
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def insert_ignore(self, values: dict) -> Optional[int]:
+        """
+        Insert a payment unless its transaction_id exists
+        Returns: the new payment id, or None if nothing was inserted
+        """
+        if self.db.get_bind().dialect.name == "mysql":
+            result = self.db.execute(insert(Payment).prefix_with("IGNORE").values(**values))
+            return result.inserted_primary_key[0] if result.rowcount == 1 else None
+
+        # SQLite's OR IGNORE does not cover foreign key failures, so it takes
+        # the savepoint path as well
+
+        savepoint = self.db.begin_nested()
+        try:
+            result = self.db.execute(insert(Payment).values(**values))
+            savepoint.commit()
+            return result.inserted_primary_key[0]
+        except IntegrityError:
+            savepoint.rollback()
+            return None
+
+    def insert_many(self, values: List[dict]) -> Set[str]:
+        """
+        Insert payments with one multi-row INSERT in the caller's transaction
+        If another writer stored one of the transaction ids first, the rows
+        are inserted one by one instead, skipping the existing ones
+        Returns: transaction ids inserted
+        """
+        savepoint = self.db.begin_nested()
+        try:
+            self.db.execute(insert(Payment), values)
+            savepoint.commit()
+            return {row["transaction_id"] for row in values}
+        except IntegrityError:
+            savepoint.rollback()
+            logger.warning(f"Payment batch of {len(values)} raced with another writer, inserting row by row")
+            return {row["transaction_id"] for row in values if self.insert_ignore(row) is not None}
+
+    def fetch(self, transaction_id: str) -> Optional[IngestedPayment]:
+        """
+        The stored payment and its customer, in one query
+        """
+        row = self.db.query(Payment, Customer).join(
+            Customer, Customer.id == Payment.customer_id
+        ).filter(Payment.transaction_id == transaction_id).first()
+        if not row:
+            return None
+        return IngestedPayment(payment=row[0], customer=row[1], created=False)
+
+    def ingest(
+        self,
+        webhook_data: PaymentWebhook,
+        payment_status: Optional[PaymentStatus] = None,
+        enqueue_curing: bool = False
+    ) -> IngestedPayment:
+        """
+        Record a webhook payment, or find it if the transaction was already recorded
+        With enqueue_curing a new successful payment gets a curing job in the
+        same transaction, so an acknowledged payment is never left uncured
+        The insert is committed before the fetch, so the returned objects are
+        fresh and curing can use them without reloading
+        Raises: CustomerNotFoundException, InvalidPaymentException
+        """
+        payment_status = payment_status or webhook_payment_status(webhook_data)
+        payment_id = self.insert_ignore({
+            "customer_id": webhook_data.customer_id,
+            "amount": webhook_data.amount,
+            "payment_method": parse_payment_method(webhook_data.payment_method),
+            "payment_status": payment_status,
+            "transaction_id": webhook_data.transaction_id,
+            "payment_date": webhook_data.timestamp
+        })
+        created = payment_id is not None
+
+        curing_job_id = None
+        if created and enqueue_curing and payment_status == PaymentStatus.SUCCESS:
+            curing_job_id = CuringJobService(self.db).enqueue(payment_id, webhook_data.customer_id).id
+        self.db.commit()
+
+        ingested = self.fetch(webhook_data.transaction_id)
+        if not ingested:
+            raise CustomerNotFoundException(webhook_data.customer_id)
+        ingested.created = created
+        ingested.curing_job_id = curing_job_id
+
+        if created:
+            logger.info(f"💰 Payment recorded: {webhook_data.transaction_id} for customer {webhook_data.customer_id}")
+        else:
+            logger.warning(f"Duplicate transaction: {webhook_data.transaction_id}")
+        return ingested
+
+    def ingest_batch(self, events: List[PaymentWebhook], enqueue_curing: bool = False) -> List[Dict[str, Any]]:
+        """
+        Record a batch of webhook payments and cure the new successful ones
+        1. Validates every event in one pass
+        2. Two IN queries find the referenced customers and the transaction ids
+           already stored; a transaction repeated in the batch is a duplicate
+           of the payment its first event inserts
+        3. New payments are written with one multi-row INSERT - with their
+           curing jobs when enqueue_curing - and committed
+        4. Curing runs with CuringService.execute_curing_batch, customers spread
+           over PAYMENT_BATCH_CURING_THREADS sessions in parallel; all payments
+           of one customer go to the same session in event order
+        Returns: one result per event, in order
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(events)
+
+        def event_result(index: int, status: str, payment_id: Optional[int] = None,
+                         message: Optional[str] = None, curing_job_id: Optional[int] = None) -> None:
+            results[index] = {
+                "index": index,
+                "transaction_id": events[index].transaction_id,
+                "customer_id": events[index].customer_id,
+                "status": status,
+                "payment_id": payment_id,
+                "curing_job_id": curing_job_id,
+                "message": message
+            }
+
+        # Step 1: Validate
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        for index, event in enumerate(events):
+            try:
+                valid.append((index, {
+                    "customer_id": event.customer_id,
+                    "amount": event.amount,
+                    "payment_method": parse_payment_method(event.payment_method),
+                    "payment_status": webhook_payment_status(event),
+                    "transaction_id": event.transaction_id,
+                    "payment_date": event.timestamp
+                }))
+            except InvalidPaymentException as e:
+                event_result(index, "invalid", message=str(e))
+
+        # Step 2: Customers and stored transactions, one IN query each
+        customer_ids = {values["customer_id"] for _, values in valid}
+        transaction_ids = {values["transaction_id"] for _, values in valid}
+        known_customers = {
+            customer_id for (customer_id,) in
+            self.db.query(Customer.id).filter(Customer.id.in_(customer_ids))
+        } if customer_ids else set()
+        stored = dict(
+            self.db.query(Payment.transaction_id, Payment.id).filter(Payment.transaction_id.in_(transaction_ids)).all()
+        ) if transaction_ids else {}
+
+        new_rows: List[Tuple[int, Dict[str, Any]]] = []
+        batch_transactions: Set[str] = set()
+        batch_duplicates: List[Tuple[int, str]] = []
+        for index, values in valid:
+            transaction_id = values["transaction_id"]
+            if transaction_id in stored:
+                event_result(index, "duplicate", stored[transaction_id], "Payment already processed")
+            elif transaction_id in batch_transactions:
+                # Answered once the earlier event's payment has an id
+                batch_duplicates.append((index, transaction_id))
+            elif values["customer_id"] not in known_customers:
+                event_result(index, "customer_not_found", message=f"Customer {values['customer_id']} not found")
+            else:
+                batch_transactions.add(transaction_id)
+                new_rows.append((index, values))
+
+        if not new_rows:
+            return results
+
+        # Step 3: Multi-row insert (plus curing jobs) in one transaction
+        inserted = self.insert_many([values for _, values in new_rows])
+        # Ids of the rows just inserted and of the ones another writer stored first
+        payment_ids = dict(
+            self.db.query(Payment.transaction_id, Payment.id).filter(Payment.transaction_id.in_(batch_transactions)).all()
+        )
+
+        to_cure: List[Tuple[int, int, int]] = []
+        for index, values in new_rows:
+            payment_id = payment_ids.get(values["transaction_id"])
+            if values["transaction_id"] not in inserted:
+                # Lost the race to another callback for the same transaction
+                event_result(index, "duplicate", payment_id, "Payment already processed")
+            elif values["payment_status"] == PaymentStatus.SUCCESS:
+                to_cure.append((index, payment_id, values["customer_id"]))
+            else:
+                event_result(index, "failed", payment_id, "Payment failed")
+        for index, transaction_id in batch_duplicates:
+            event_result(index, "duplicate", payment_ids.get(transaction_id), "Payment already processed")
+
+        if enqueue_curing:
+            job_ids = CuringJobService(self.db).enqueue_many([(payment_id, customer_id) for _, payment_id, customer_id in to_cure])
+            self.db.commit()
+            for index, payment_id, _ in to_cure:
+                event_result(index, "queued", payment_id, "Payment recorded and curing queued", job_ids.get(payment_id))
+            return results
+        self.db.commit()
+        logger.info(f"💰 Payment batch recorded: {len(inserted)} of {len(events)} callbacks were new")
+        if not to_cure:
+            return results
+
+        # Step 4: Cure, one session per partition of customers
+        threads = max(1, min(settings.PAYMENT_BATCH_CURING_THREADS, len({customer_id for _, _, customer_id in to_cure})))
+        partitions: List[List[int]] = [[] for _ in range(threads)]
+        slots: Dict[int, int] = {}
+        for _, payment_id, customer_id in to_cure:
+            partitions[slots.setdefault(customer_id, len(slots) % threads)].append(payment_id)
+
+        curing_results: Dict[int, Dict[str, Any]] = {}
+        if threads == 1:
+            curing_results.update(cure_payments(partitions[0], self.db))
+        else:
+            for partition_results in _curing_executor.map(cure_payments, partitions):
+                curing_results.update(partition_results)
+
+        for index, payment_id, _ in to_cure:
+            curing_result = curing_results.get(payment_id, {})
+            if curing_result.get("success"):
+                event_result(index, "success", payment_id, curing_result.get("message"))
+            else:
+                event_result(index, "curing_failed", payment_id, curing_result.get("message", "Payment recorded but curing failed"))
+
+        return results
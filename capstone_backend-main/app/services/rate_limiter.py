@@ -0,0 +1,181 @@
+"""
+Rate Limiter - Token buckets for outbound notification channels
+Keeps each channel under its provider's messages-per-second quota, either
+per process or shared by every worker through the rate_limit_buckets table
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.rate_limit_bucket import RateLimitBucket
+from app.utils.enums import NotificationChannel
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    In-process token bucket: `rate` tokens per second, holding at most `capacity`
+    acquire() takes tokens in pieces no larger than the capacity, so a large
+    batch waits for several refills instead of never fitting
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._refilled_at = time.monotonic()
+
+    def _take(self, wanted: float) -> Tuple[float, float]:
+        """
+        Take up to `wanted` whole tokens
+        Returns: (tokens granted, seconds until the next token if none were)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+
+            granted = min(wanted, int(self._tokens))
+            if granted >= 1:
+                self._tokens -= granted
+                return granted, 0.0
+            return 0, (1 - self._tokens) / self.rate
+
+    def acquire(self, tokens: int = 1) -> None:
+        """
+        Block until `tokens` tokens have been taken
+        """
+        remaining = tokens
+        while remaining > 0:
+            granted, wait = self._take(remaining)
+            remaining -= granted
+            if remaining > 0 and wait:
+                time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 1) -> None:
+        """
+        acquire() for the asyncio gateways - waits without blocking the loop
+        """
+        remaining = tokens
+        while remaining > 0:
+            granted, wait = self._take(remaining)
+            remaining -= granted
+            if remaining > 0 and wait:
+                await asyncio.sleep(wait)
+
+class DbTokenBucket(TokenBucket):
+    """
+    Token bucket shared by all processes through one rate_limit_buckets row
+    Each round trip locks the row, refills it and leases up to
+    NOTIFICATION_RATE_LIMIT_LEASE tokens to this process, which spends them
+    locally - so the database sees one short transaction per lease, not per message
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        capacity: float,
+        session_factory: Callable = SessionLocal,
+        lease_size: Optional[int] = None
+    ):
+        super().__init__(name, rate, capacity)
+        self.session_factory = session_factory
+        self.lease_size = lease_size or settings.NOTIFICATION_RATE_LIMIT_LEASE
+        self._tokens = 0.0  # Leased from the shared bucket, not yet spent
+
+    def _lease(self, wanted: float) -> Tuple[float, float]:
+        """
+        Take up to `wanted` tokens from the shared bucket
+        Returns: (tokens granted, seconds until the next token if none were)
+        """
+        db = self.session_factory()
+        try:
+            bucket = db.query(RateLimitBucket).filter(
+                RateLimitBucket.name == self.name
+            ).with_for_update().first()
+
+            now = time.time()
+            if not bucket:
+                bucket = RateLimitBucket(name=self.name, tokens=self.capacity, refilled_at=now)
+                db.add(bucket)
+
+            tokens = min(self.capacity, bucket.tokens + max(now - bucket.refilled_at, 0) * self.rate)
+            granted = min(wanted, int(tokens))
+            bucket.tokens = tokens - granted
+            bucket.refilled_at = now
+            db.commit()
+
+            if granted >= 1:
+                return granted, 0.0
+            return 0, (1 - tokens) / self.rate
+        except IntegrityError:
+            # Another worker created the row first - retry against it
+            db.rollback()
+            return 0, 0.0
+        finally:
+            db.close()
+
+    def _take(self, wanted: float) -> Tuple[float, float]:
+        with self._lock:
+            if self._tokens < 1:
+                granted, wait = self._lease(min(max(wanted, self.lease_size), self.capacity))
+                if not granted:
+                    return 0, wait
+                self._tokens += granted
+
+            granted = min(wanted, int(self._tokens))
+            self._tokens -= granted
+            return granted, 0.0
+
+    async def acquire_async(self, tokens: int = 1) -> None:
+        # Leasing is a blocking DB round trip - keep it off the event loop
+        await asyncio.to_thread(self.acquire, tokens)
+
+def channel_rates() -> Dict[NotificationChannel, float]:
+    """
+    Configured messages per second for every sending channel
+    """
+    return {
+        NotificationChannel.SMS: settings.NOTIFICATION_SMS_RATE_PER_SECOND,
+        NotificationChannel.EMAIL: settings.NOTIFICATION_EMAIL_RATE_PER_SECOND,
+        NotificationChannel.APP: settings.NOTIFICATION_APP_RATE_PER_SECOND
+    }
+
+_buckets: Dict[NotificationChannel, Optional[TokenBucket]] = {}
+_buckets_lock = threading.Lock()
+
+def get_channel_limiter(channel: NotificationChannel) -> Optional[TokenBucket]:
+    """
+    Process-wide bucket for a channel, or None when the channel is unlimited
+    """
+    with _buckets_lock:
+        if channel not in _buckets:
+            rate = channel_rates().get(channel, 0)
+            if not rate or rate <= 0:
+                _buckets[channel] = None
+            else:
+                name = f"notification:{channel.value}"
+                capacity = rate * settings.NOTIFICATION_RATE_LIMIT_BURST_SECONDS
+                if settings.NOTIFICATION_RATE_LIMIT_BACKEND == "db":
+                    _buckets[channel] = DbTokenBucket(name, rate, capacity)
+                else:
+                    _buckets[channel] = TokenBucket(name, rate, capacity)
+                logger.info(
+                    f"Rate limiting {channel.value} to {rate}/s "
+                    f"({settings.NOTIFICATION_RATE_LIMIT_BACKEND} bucket)"
+                )
+        return _buckets[channel]
+
+def reset_channel_limiters() -> None:
+    """
+    Drop cached buckets so changed settings take effect
+    """
+    with _buckets_lock:
+        _buckets.clear()
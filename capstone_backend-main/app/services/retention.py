@@ -0,0 +1,254 @@
+"""
+Retention Job - Archives old notifications and dunning logs
+Rows past their retention age are moved, a small chunk per transaction, into
+archive_batches as zlib-compressed JSON, keeping the live tables small
+
+Run from cron or by hand (safe during business hours):
+    python -m app.services.retention [--table notifications] [--max-chunks N] [--from-start]
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import select, delete, update
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.archive_batch import ArchiveBatch
+from app.models.notification import Notification
+from app.models.dunning_log import DunningLog
+from app.models.retention_cursor import RetentionCursor
+from app.utils.enums import NotificationStatus
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    What to archive from one table
+    archivable_statuses limits archiving to rows in a final state
+    prepare runs before each archive pass, e.g. to settle rows stuck in a
+    non-final state
+    """
+    table_name: str
+    model: Any
+    retention_days: int
+    archivable_statuses: Optional[tuple] = None
+    prepare: Optional[Callable[[Session], int]] = None
+
+def dead_letter_stranded_notifications(db: Session) -> int:
+    """
+    Dead-letter FAILED notifications without a next_attempt_at
+    Rows written before retries were scheduled are never claimed again, so
+    they would stay FAILED, and unarchivable, forever
+    Returns: number of rows dead-lettered
+    """
+    count = db.execute(
+        update(Notification).where(
+            Notification.status == NotificationStatus.FAILED,
+            Notification.next_attempt_at.is_(None)
+        ).values(status=NotificationStatus.DEAD_LETTER).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return count
+
+def retention_policies() -> Dict[str, RetentionPolicy]:
+    """
+    Configured policy for every archived table
+    """
+    return {
+        "notifications": RetentionPolicy(
+            "notifications",
+            Notification,
+            settings.RETENTION_NOTIFICATION_DAYS,
+            # PENDING, SENT and FAILED rows are still being sent or awaiting a receipt
+            (NotificationStatus.DELIVERED.value, NotificationStatus.DEAD_LETTER.value),
+            dead_letter_stranded_notifications
+        ),
+        "dunning_logs": RetentionPolicy("dunning_logs", DunningLog, settings.RETENTION_DUNNING_LOG_DAYS)
+    }
+
+def encode_rows(rows: List[Dict[str, Any]]) -> bytes:
+    return zlib.compress(json.dumps(rows, default=str, separators=(",", ":")).encode("utf-8"))
+
+def read_archive_batch(batch: ArchiveBatch) -> List[Dict[str, Any]]:
+    """
+    Rows stored in an archive batch (timestamps come back as ISO strings)
+    """
+    return json.loads(zlib.decompress(batch.payload).decode("utf-8"))
+
+class RetentionJob:
+    """
+    Archives a table in id order:
+    1. Reads the next chunk of rows by primary key and stops at the first row
+       newer than the cutoff - ids grow with created_at, so no scan of
+       created_at is needed
+    2. Writes the chunk to one archive batch and deletes the archived ids in
+       the same short transaction, so a crash loses or duplicates nothing
+    3. Sleeps between chunks to leave the database to live traffic
+    The scan position is stored in retention_cursors in each chunk's
+    transaction, so every run (or an interrupted one) resumes where the last
+    stopped instead of rescanning the rows it kept. A row passed while it was
+    not yet in a final state is only looked at again by a from_start run
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        pause_seconds: Optional[float] = None,
+        session_factory=SessionLocal
+    ):
+        self.chunk_size = chunk_size or settings.RETENTION_CHUNK_SIZE
+        self.pause_seconds = settings.RETENTION_CHUNK_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+        self.session_factory = session_factory
+
+    def load_cursor(self, db: Session, table_name: str) -> RetentionCursor:
+        """
+        The table's stored scan position, created at 0 on the first run
+        """
+        cursor = db.get(RetentionCursor, table_name)
+        if not cursor:
+            cursor = RetentionCursor(table_name=table_name, last_scanned_id=0)
+            db.add(cursor)
+            db.commit()
+        return cursor
+
+    def archive_chunk(self, db: Session, policy: RetentionPolicy, cutoff: datetime, cursor: RetentionCursor) -> Dict[str, Any]:
+        """
+        Archive one chunk of rows after the cursor and advance it in the same transaction
+        Returns: archived count, the id to continue from and whether the cutoff was reached
+        """
+        table = policy.model.__table__
+        rows = [
+            dict(row)
+            for row in db.execute(
+                select(table).where(table.c.id > cursor.last_scanned_id).order_by(table.c.id).limit(self.chunk_size)
+            ).mappings()
+        ]
+
+        expired = []
+        reached_cutoff = len(rows) < self.chunk_size
+        last_scanned = cursor.last_scanned_id
+        for row in rows:
+            # Rows newer than the cutoff are not passed - they expire later
+            if row["created_at"] is not None and row["created_at"] >= cutoff:
+                reached_cutoff = True
+                break
+            last_scanned = row["id"]
+            if policy.archivable_statuses and row.get("status") not in policy.archivable_statuses:
+                continue
+            expired.append(row)
+
+        if expired:
+            created = [row["created_at"] for row in expired if row["created_at"] is not None]
+            db.add(ArchiveBatch(
+                table_name=policy.table_name,
+                first_id=expired[0]["id"],
+                last_id=expired[-1]["id"],
+                row_count=len(expired),
+                oldest_created_at=min(created) if created else None,
+                newest_created_at=max(created) if created else None,
+                payload=encode_rows(expired)
+            ))
+            db.execute(delete(table).where(table.c.id.in_([row["id"] for row in expired])))
+        cursor.last_scanned_id = last_scanned
+        db.commit()
+
+        return {"archived": len(expired), "last_id": last_scanned, "done": reached_cutoff}
+
+    def archive_table(
+        self,
+        table_name: str,
+        max_chunks: Optional[int] = None,
+        stop_event: Optional[threading.Event] = None,
+        from_start: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Archive every expired row of a table, or up to max_chunks chunks
+        from_start rescans from the first id instead of the stored position
+        """
+        policy = retention_policies()[table_name]
+        cutoff = datetime.now() - timedelta(days=policy.retention_days)
+        archived = 0
+        chunks = 0
+        started = time.time()
+
+        db = self.session_factory()
+        try:
+            if policy.prepare:
+                settled = policy.prepare(db)
+                if settled:
+                    logger.info(f"Settled {settled} stranded {table_name} rows before archiving")
+
+            cursor = self.load_cursor(db, table_name)
+            if from_start:
+                cursor.last_scanned_id = 0
+                db.commit()
+            after_id = cursor.last_scanned_id
+            logger.info(f"Archiving {table_name} rows created before {cutoff.isoformat()}, after id {after_id}")
+
+            while not (stop_event and stop_event.is_set()):
+                if max_chunks is not None and chunks >= max_chunks:
+                    break
+                result = self.archive_chunk(db, policy, cutoff, cursor)
+                chunks += 1
+                archived += result["archived"]
+                after_id = result["last_id"]
+                if result["archived"]:
+                    logger.info(f"Archived {archived} {table_name} rows so far (through id {after_id})")
+                if result["done"]:
+                    break
+                # Keep the identity map down to the cursor and let live traffic in
+                db.expunge_all()
+                db.add(cursor)
+                if self.pause_seconds:
+                    time.sleep(self.pause_seconds)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        elapsed = time.time() - started
+        logger.info(f"Archived {archived} {table_name} rows in {chunks} chunks ({elapsed:.1f}s)")
+        return {"table": table_name, "archived": archived, "chunks": chunks, "elapsed": elapsed}
+
+    def run(
+        self,
+        tables: Optional[List[str]] = None,
+        max_chunks: Optional[int] = None,
+        from_start: bool = False
+    ) -> List[Dict[str, Any]]:
+        return [
+            self.archive_table(table_name, max_chunks, from_start=from_start)
+            for table_name in (tables or list(retention_policies()))
+        ]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive notifications and dunning logs past retention")
+    parser.add_argument("--table", action="append", choices=list(retention_policies()), help="Table to archive (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per transaction (default: RETENTION_CHUNK_SIZE)")
+    parser.add_argument("--pause", type=float, default=None, help="Seconds between chunks (default: RETENTION_CHUNK_PAUSE_SECONDS)")
+    parser.add_argument("--max-chunks", type=int, default=None, help="Stop after this many chunks per table")
+    parser.add_argument("--from-start", action="store_true", help="Rescan from the first id instead of the stored position")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    job = RetentionJob(args.chunk_size, args.pause)
+    try:
+        for result in job.run(args.table, args.max_chunks, args.from_start):
+            logger.info(f"{result['table']}: {result['archived']} rows archived")
+    except KeyboardInterrupt:
+        logger.info("Retention job stopped - the next run resumes where it left off")
+
+if __name__ == "__main__":
+    main()
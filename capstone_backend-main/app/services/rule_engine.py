@@ -3,15 +3,24 @@ Rule Engine Service - Core dunning logic
 Evaluates customers against dunning rules and applies actions
 """
 import logging
-from datetime import datetime, date
-from typing import List, Dict, Any
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Set
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, or_, func, case, false
+from app.config.settings import settings
 from app.models.customer import Customer
-from app.models.dunning_rule import DunningRule
 from app.models.dunning_log import DunningLog
-from app.utils.enums import CustomerType, ActionType, DunningStatus, NotificationChannel
-from app.services.notification_service import NotificationService
+from app.models.dunning_run_ledger import DunningRunLedger
+from app.utils.enums import ActionType, DunningStatus, NotificationChannel, NotificationLane
+from app.services.notification_service import NotificationService, rule_lane
+from app.services.channel_gateways import SEND_CHANNELS
+from app.services.notification_templates import TemplateRef, template_registry
+from app.services.rule_index import rule_index, CompiledRule
+from app.services.dunning_scheduler import DunningScheduler
+from app.services.customer_versioning import versioned_update
+from app.utils.exceptions import ConcurrentUpdateException
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +34,20 @@ class RuleEngine:
     5. Logs all actions
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, commit_batch_size: Optional[int] = None, force: bool = False):
         self.db = db
+        # Fixed for the whole run so a run crossing midnight stays consistent
+        self.as_of_date = date.today()
+        # force=True re-executes rules already recorded in the run ledger
+        self.force = force
+        # (customer_id, rule_id) pairs already executed on as_of_date
+        self.executed_rules: Set[Tuple[int, int]] = set()
         self.notification_service = NotificationService(db)
+        # Customers written per transaction in batch runs
+        self.commit_batch_size = commit_batch_size or settings.DUNNING_COMMIT_BATCH_SIZE
+        self.rule_index = rule_index
+        self.rule_index.ensure_fresh(db)
+        self.scheduler = DunningScheduler(db)
     
     def calculate_overdue_days(self, customer: Customer) -> int:
         """
@@ -36,25 +56,17 @@ class RuleEngine:
         if not customer.due_date:
             return 0
         
-        today = date.today()
+        today = self.as_of_date
         if today > customer.due_date:
             return (today - customer.due_date).days
         return 0
     
-    def get_applicable_rules(self, customer: Customer, overdue_days: int) -> List[DunningRule]:
+    def get_applicable_rules(self, customer: Customer, overdue_days: int) -> List[CompiledRule]:
         """
         Get all active dunning rules applicable to this customer
         """
-        # Query rules that match customer type (specific or ALL) and trigger day
-        rules = self.db.query(DunningRule).filter(
-            and_(
-                DunningRule.is_active == True,
-                DunningRule.trigger_day == overdue_days,
-                DunningRule.customer_type.in_([customer.customer_type, CustomerType.ALL])
-            )
-        ).order_by(DunningRule.priority.desc()).all()
-        
-        return rules
+        # Rules for the customer type (merged with ALL), highest priority first
+        return self.rule_index.get_rules(customer.customer_type, overdue_days)
     
     def apply_action(self, customer: Customer, action: ActionType) -> str:
         """
@@ -87,79 +99,82 @@ class RuleEngine:
         
         return action_taken
     
-    def generate_notification_message(
+    def notification_template(
         self,
         customer: Customer,
-        rule: DunningRule,
+        rule: CompiledRule,
         overdue_days: int
-    ) -> str:
-        """
-        Generate personalized notification message based on rule and customer
-        """
-        messages = {
-            ActionType.NOTIFY: (
-                f"Dear {customer.name}, your bill of ₹{customer.outstanding_amount:.2f} "
-                f"is overdue by {overdue_days} days. Please pay to avoid service disruption. "
-                f"Due date was: {customer.due_date.strftime('%d %b %Y')}"
-            ),
-            ActionType.THROTTLE: (
-                f"Dear {customer.name}, due to payment delay of {overdue_days} days, "
-                f"your data speed has been reduced. Outstanding: ₹{customer.outstanding_amount:.2f}. "
-                f"Pay now to restore full speed."
-            ),
-            ActionType.BAR_OUTGOING: (
-                f"URGENT: {customer.name}, your outgoing services have been barred due to "
-                f"{overdue_days} days overdue payment of ₹{customer.outstanding_amount:.2f}. "
-                f"Pay immediately to restore services."
-            ),
-            ActionType.DEACTIVATE: (
-                f"FINAL NOTICE: {customer.name}, your service has been suspended due to "
-                f"non-payment for {overdue_days} days. Outstanding: ₹{customer.outstanding_amount:.2f}. "
-                f"Immediate payment required to avoid disconnection."
-            )
+    ) -> TemplateRef:
+        """
+        Template and parameters of the notification for a rule and customer
+        """
+        templates = {
+            ActionType.NOTIFY: "dunning.notify",
+            ActionType.THROTTLE: "dunning.throttle",
+            ActionType.BAR_OUTGOING: "dunning.bar_outgoing",
+            ActionType.DEACTIVATE: "dunning.deactivate"
         }
         
-        return messages.get(rule.action_type, f"Payment reminder for ₹{customer.outstanding_amount:.2f}")
+        return template_registry.ref(
+            templates.get(rule.action_type, "dunning.reminder"),
+            name=customer.name,
+            amount=float(customer.outstanding_amount),
+            days=overdue_days,
+            due_date=customer.due_date.strftime('%d %b %Y')
+        )
     
-    def execute_rule(self, customer: Customer, rule: DunningRule, overdue_days: int) -> Dict[str, Any]:
+    def execute_rule(
+        self,
+        customer: Customer,
+        rule: CompiledRule,
+        overdue_days: int,
+        send_notification: bool = True
+    ) -> Dict[str, Any]:
         """
         Execute a single dunning rule for a customer
+        Writes are flushed inside a savepoint and committed by the caller's
+        unit of work; a failing rule only rolls back its own savepoint
+        The customer's changes and the run ledger row are flushed before any
+        notification is sent, so a rule that cannot be recorded sends nothing
+        With send_notification=False the message template is returned for
+        coalescing instead of being sent
         Returns: execution result details
         """
+        customer_id = customer.id
+        savepoint = self.db.begin_nested()
         try:
             # Apply the action
             action_taken = self.apply_action(customer, rule.action_type)
             
-            # Generate and send notification
-            message = self.generate_notification_message(customer, rule, overdue_days)
-            
-            notification = None
-            notification_sent = False
+            # Update customer overdue days - always written, so the flush below
+            # is a versioned UPDATE that fails if the customer changed since it was read
+            customer.overdue_days = overdue_days
+            flag_modified(customer, "overdue_days")
             
-            if rule.notification_channel != NotificationChannel.ALL:
-                notification = self.notification_service.create_and_send_notification(
-                    customer_id=customer.id,
-                    channel=rule.notification_channel,
-                    message=message,
+            # Record the execution in the run ledger (already there on a forced rerun)
+            if (customer_id, rule.id) not in self.executed_rules:
+                self.db.add(DunningRunLedger(
+                    as_of_date=self.as_of_date,
+                    customer_id=customer_id,
                     rule_id=rule.id
-                )
-                notification_sent = True
-            else:
-                # Send via all channels
-                for channel in [NotificationChannel.SMS, NotificationChannel.EMAIL, NotificationChannel.APP]:
-                    try:
-                        self.notification_service.create_and_send_notification(
-                            customer_id=customer.id,
-                            channel=channel,
-                            message=message,
-                            rule_id=rule.id
-                        )
-                        notification_sent = True
-                    except Exception as e:
-                        logger.error(f"Failed to send {channel} notification: {str(e)}")
+                ))
             
-            # Update customer overdue days
-            customer.overdue_days = overdue_days
+            # Written before anything is sent: a customer changed by a payment
+            # or a rule another run already recorded fails here, so no notice
+            # goes out on a stale read or twice
+            self.db.flush()
+            
+            # Generate and send notification (stored as template id and parameters)
+            message = self.notification_template(customer, rule, overdue_days)
+            
+            notification_sent = False
+            if send_notification:
+                # One multi-row insert for all of the rule's channels
+                notifications = self.notification_service.fan_out(
+                    customer, self.rule_channels(rule), message, rule_id=rule.id, commit=False,
+                    lane=rule_lane(rule.action_type, rule.priority)
+                )
+                notification_sent = bool(notifications)
             
             # Create dunning log
             log_details = {
@@ -171,6 +186,8 @@ class RuleEngine:
                 "action_taken": action_taken,
                 "notification_sent": notification_sent
             }
+            if not send_notification:
+                log_details["notification_coalesced"] = True
             
             dunning_log = DunningLog(
                 customer_id=customer.id,
@@ -181,19 +198,25 @@ class RuleEngine:
             )
             self.db.add(dunning_log)
             
-            self.db.commit()
+            # Flush and release the savepoint - the commit belongs to the unit of work
+            savepoint.commit()
             
             return {
                 "success": True,
                 "rule_id": rule.id,
                 "rule_name": rule.rule_name,
                 "action_taken": action_taken,
-                "notification_sent": notification_sent
+                "notification_sent": notification_sent,
+                "notification_message": message
             }
             
+        except StaleDataError:
+            # The whole customer is re-read and re-evaluated (process_loaded_customer)
+            savepoint.rollback()
+            raise
         except Exception as e:
-            logger.error(f"Failed to execute rule {rule.id} for customer {customer.id}: {str(e)}")
-            self.db.rollback()
+            logger.error(f"Failed to execute rule {rule.id} for customer {customer_id}: {str(e)}")
+            savepoint.rollback()
             return {
                 "success": False,
                 "rule_id": rule.id,
@@ -201,6 +224,70 @@ class RuleEngine:
                 "error": str(e)
             }
     
+    def rule_channels(self, rule: CompiledRule) -> Tuple[NotificationChannel, ...]:
+        """
+        Sending channels a rule notifies on (ALL expands to every channel)
+        """
+        if rule.notification_channel == NotificationChannel.ALL:
+            return SEND_CHANNELS
+        return (rule.notification_channel,)
+    
+    def coalesce_notifications(
+        self,
+        customer: Customer,
+        executed: List[Tuple[CompiledRule, Dict[str, Any]]]
+    ) -> int:
+        """
+        Send one message per channel for all rules executed for a customer
+        1. Each channel's message joins the messages of the rules notifying on
+           it, highest priority first (the order the rules were executed in)
+        2. Channels with the same combined message share one fan-out, recorded
+           against the highest-priority rule that contributed to it
+        3. The message goes on the most urgent lane of its rules
+        Returns: number of distinct messages sent
+        """
+        per_channel: Dict[NotificationChannel, List[Tuple[CompiledRule, TemplateRef]]] = {}
+        for rule, result in executed:
+            for channel in self.rule_channels(rule):
+                per_channel.setdefault(channel, []).append((rule, result["notification_message"]))
+        
+        lane_order = list(NotificationLane)
+        groups: List[Tuple[int, TemplateRef, NotificationLane, List[NotificationChannel]]] = []
+        for channel in SEND_CHANNELS:
+            parts = per_channel.get(channel)
+            if not parts:
+                continue
+            messages = []
+            for _, message in parts:
+                if message not in messages:
+                    messages.append(message)
+            rule_id, message = parts[0][0].id, TemplateRef.combine(messages)
+            lane = min(
+                (rule_lane(rule.action_type, rule.priority) for rule, _ in parts),
+                key=lane_order.index
+            )
+            for group_rule_id, group_message, _, channels in groups:
+                if (group_rule_id, group_message) == (rule_id, message):
+                    channels.append(channel)
+                    break
+            else:
+                groups.append((rule_id, message, lane, [channel]))
+        
+        sent = 0
+        for rule_id, message, lane, channels in groups:
+            savepoint = self.db.begin_nested()
+            try:
+                self.notification_service.fan_out(
+                    customer, channels, message, rule_id=rule_id, commit=False, lane=lane
+                )
+                savepoint.commit()
+                sent += 1
+            except Exception as e:
+                logger.error(f"Failed to send coalesced notification for customer {customer.id}: {str(e)}")
+                savepoint.rollback()
+        
+        return sent
+    
     def process_customer(self, customer_id: int) -> Dict[str, Any]:
         """
         Process a single customer through the dunning engine
@@ -213,13 +300,55 @@ class RuleEngine:
                 "message": "Customer not found"
             }
         
+        # One transaction per customer
+        self.executed_rules = self.load_executed_rules([customer_id])
+        result = self.process_loaded_customer(customer)
+        return self.commit_batch([result])[0]
+    
+    def process_loaded_customer(self, customer: Customer) -> Dict[str, Any]:
+        """
+        Process an already loaded customer through the dunning engine and
+        move next_action_date past today - unless a rule failed, so a retry
+        run today selects the customer again
+        The customer's writes go through versioned_update: a customer a payment
+        changed since the chunk was loaded fails its first flush, before any
+        notification is sent, and is re-read and evaluated on its current balance
+        """
+        def evaluate() -> Dict[str, Any]:
+            result = self.evaluate_customer(customer)
+            
+            rule_failed = len(result.get("actions_taken", [])) < result.get("rules_applied", 0)
+            if not rule_failed:
+                self.scheduler.refresh_customer(customer, self.as_of_date + timedelta(days=1))
+            
+            return result
+        
+        customer_id = customer.id
+        try:
+            return versioned_update(self.db, customer, evaluate)
+        except ConcurrentUpdateException as e:
+            logger.error(str(e))
+            return {
+                "customer_id": customer_id,
+                "status": "FAILED",
+                "message": str(e)
+            }
+    
+    def evaluate_customer(self, customer: Customer) -> Dict[str, Any]:
+        """
+        Evaluate a loaded customer against the rules and execute the ones that fire
+        """
+        # Capture identity up front - commits below expire the instance
+        customer_id = customer.id
+        customer_name = customer.name
+        
         # Calculate overdue days
         overdue_days = self.calculate_overdue_days(customer)
         
         if overdue_days == 0:
             return {
                 "customer_id": customer_id,
-                "customer_name": customer.name,
+                "customer_name": customer_name,
                 "status": "SKIPPED",
                 "message": "Customer not overdue"
             }
@@ -230,52 +359,287 @@ class RuleEngine:
         if not rules:
             return {
                 "customer_id": customer_id,
-                "customer_name": customer.name,
+                "customer_name": customer_name,
                 "overdue_days": overdue_days,
                 "status": "SKIPPED",
                 "message": f"No rules configured for day {overdue_days}"
             }
         
+        if not self.force:
+            rules = [rule for rule in rules if (customer_id, rule.id) not in self.executed_rules]
+            if not rules:
+                return {
+                    "customer_id": customer_id,
+                    "customer_name": customer_name,
+                    "overdue_days": overdue_days,
+                    "status": "SKIPPED",
+                    "message": f"Rules for day {overdue_days} already executed on {self.as_of_date.isoformat()}"
+                }
+        
         # Execute all applicable rules
         rules_executed = []
         actions_taken = []
         notifications_sent = 0
+        # Coalescing defers every rule's notification to one message per channel
+        coalesce = settings.DUNNING_COALESCE_NOTIFICATIONS and len(rules) > 1
+        coalesced = []
         
         for rule in rules:
-            result = self.execute_rule(customer, rule, overdue_days)
+            result = self.execute_rule(customer, rule, overdue_days, send_notification=not coalesce)
             rules_executed.append(result)
             
             if result.get("success"):
                 actions_taken.append(result.get("action_taken"))
                 if result.get("notification_sent"):
                     notifications_sent += 1
+                if coalesce:
+                    coalesced.append((rule, result))
+        
+        if coalesced:
+            notifications_sent = self.coalesce_notifications(customer, coalesced)
         
         return {
             "customer_id": customer_id,
-            "customer_name": customer.name,
+            "customer_name": customer_name,
             "overdue_days": overdue_days,
             "rules_applied": len(rules_executed),
             "actions_taken": actions_taken,
             "notifications_sent": notifications_sent,
-            "status": "SUCCESS",
+            # Every rule rolled back to its savepoint - nothing was written for this customer
+            "status": "SUCCESS" if actions_taken else "FAILED",
             "message": f"Processed {len(rules_executed)} rules"
         }
     
-    def process_all_overdue_customers(self) -> List[Dict[str, Any]]:
+    def overdue_customer_filter(self) -> List[Any]:
         """
-        Process all overdue customers through dunning engine
+        SQL conditions selecting every overdue customer with an outstanding balance
         """
-        # Get all customers with outstanding amounts
-        customers = self.db.query(Customer).filter(
-            Customer.outstanding_amount > 0
+        return [
+            Customer.outstanding_amount > 0,
+            Customer.due_date < self.as_of_date
+        ]
+    
+    def trigger_day_condition(self) -> Any:
+        """
+        SQL condition matching customers whose overdue days equal an active trigger day
+        overdue_days == trigger_day  <=>  due_date == as_of_date - trigger_day,
+        so the match is an IN list on (customer_type, due_date) and stays index friendly
+        """
+        conditions = []
+        for customer_type, trigger_days in self.rule_index.get_trigger_days().items():
+            due_dates = [self.as_of_date - timedelta(days=day) for day in sorted(trigger_days) if day > 0]
+            if due_dates:
+                conditions.append(and_(
+                    Customer.customer_type == customer_type,
+                    Customer.due_date.in_(due_dates)
+                ))
+        
+        return or_(*conditions) if conditions else false()
+    
+    def candidate_condition(self) -> Any:
+        """
+        SQL condition selecting customers with work today
+        Normal runs range-scan the precomputed next_action_date; forced reruns
+        match trigger days directly because today's dates were already advanced
+        """
+        if self.force:
+            return self.trigger_day_condition()
+        return Customer.next_action_date <= self.as_of_date
+    
+    def due_customer_filter(self) -> List[Any]:
+        """
+        SQL conditions selecting only customers some active rule fires for today
+        """
+        return self.overdue_customer_filter() + [self.candidate_condition()]
+    
+    def count_overdue_customers(
+        self,
+        min_id: Optional[int] = None,
+        max_id: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """
+        Count overdue customers in one aggregate query
+        Returns: (candidates with work today, unmatched customers no rule fires for)
+        Unmatched customers are reported as skipped without being loaded
+        """
+        conditions = self.overdue_customer_filter()
+        if min_id is not None:
+            conditions.append(Customer.id >= min_id)
+        if max_id is not None:
+            conditions.append(Customer.id <= max_id)
+        
+        total, matched = self.db.query(
+            func.count(Customer.id),
+            func.sum(case((self.candidate_condition(), 1), else_=0))
+        ).filter(and_(*conditions)).one()
+        
+        matched = int(matched or 0)
+        return matched, (total or 0) - matched
+    
+    def get_overdue_id_bounds(self) -> Optional[Tuple[int, int]]:
+        """
+        Lowest and highest customer id among customers due for an action today
+        """
+        min_id, max_id = self.db.query(
+            func.min(Customer.id), func.max(Customer.id)
+        ).filter(and_(*self.due_customer_filter())).one()
+        
+        if min_id is None:
+            return None
+        return min_id, max_id
+    
+    def iter_overdue_customer_chunks(
+        self,
+        batch_size: Optional[int] = None,
+        min_id: Optional[int] = None,
+        max_id: Optional[int] = None
+    ) -> Iterator[List[Customer]]:
+        """
+        Walk customers due for an action today in id-ordered keyset chunks
+        Each chunk is a fresh query (id > last seen id), so no OFFSET scans
+        Optional min_id/max_id (inclusive) restrict the walk to one id range
+        """
+        batch_size = batch_size or settings.DUNNING_BATCH_SIZE
+        last_id = min_id - 1 if min_id is not None else 0
+        
+        while True:
+            conditions = [Customer.id > last_id] + self.due_customer_filter()
+            if max_id is not None:
+                conditions.append(Customer.id <= max_id)
+            
+            customers = self.db.query(Customer).filter(
+                and_(*conditions)
+            ).order_by(Customer.id).limit(batch_size).all()
+            
+            if not customers:
+                break
+            
+            last_id = customers[-1].id
+            yield customers
+            
+            if len(customers) < batch_size:
+                break
+    
+    def load_executed_rules(self, customer_ids: List[int]) -> Set[Tuple[int, int]]:
+        """
+        Fetch (customer_id, rule_id) pairs already executed on as_of_date
+        One indexed lookup per batch of customers
+        """
+        if not customer_ids:
+            return set()
+        
+        rows = self.db.query(DunningRunLedger.customer_id, DunningRunLedger.rule_id).filter(
+            and_(
+                DunningRunLedger.as_of_date == self.as_of_date,
+                DunningRunLedger.customer_id.in_(customer_ids)
+            )
         ).all()
+        return {(row.customer_id, row.rule_id) for row in rows}
+    
+    def commit_batch(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Commit the unit of work holding these customers' writes
+        Rollback rule: a failed rule was already rolled back to its savepoint;
+        if the commit itself fails, the whole batch is rolled back and every
+        customer that had succeeded in it is reported as FAILED
+        """
+        try:
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Dunning batch commit failed for {len(results)} customers: {str(e)}")
+            self.db.rollback()
+            for result in results:
+                if result.get("status") == "SUCCESS":
+                    result["status"] = "FAILED"
+                    result["message"] = f"Batch commit failed: {str(e)}"
         
-        results = []
-        for customer in customers:
-            # Calculate if overdue
-            overdue_days = self.calculate_overdue_days(customer)
-            if overdue_days > 0:
-                result = self.process_customer(customer.id)
-                results.append(result)
+        return results
+    
+    def iter_process_customer_chunk(self, customers: List[Customer]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Evaluate and execute rules for a chunk of loaded customers,
+        committing every commit_batch_size customers in a single transaction
+        and yielding each batch's results as soon as it is committed,
+        then expunge the chunk so the identity map does not grow across chunks
+        """
+        # Pick up rule changes made by other workers since the last chunk
+        self.rule_index.ensure_fresh(self.db)
+        
+        # Work finished by an earlier or crashed run today is skipped
+        self.executed_rules = self.load_executed_rules([c.id for c in customers])
         
+        pending = []
+        # Keep the rest of the chunk loaded across batch commits instead of
+        # reloading every customer after the first commit expires them
+        expire_on_commit = self.db.expire_on_commit
+        self.db.expire_on_commit = False
+        try:
+            for customer in customers:
+                # Calculate if overdue
+                overdue_days = self.calculate_overdue_days(customer)
+                if overdue_days > 0:
+                    pending.append(self.process_loaded_customer(customer))
+                
+                if len(pending) >= self.commit_batch_size:
+                    yield self.commit_batch(pending)
+                    pending = []
+            
+            results = self.commit_batch(pending)
+            if results:
+                yield results
+        finally:
+            self.db.expire_on_commit = expire_on_commit
+            self.db.expunge_all()
+    
+    def process_customer_chunk(self, customers: List[Customer]) -> List[Dict[str, Any]]:
+        """
+        Process a chunk of loaded customers and return all of its results
+        """
+        results = []
+        for batch in self.iter_process_customer_chunk(customers):
+            results.extend(batch)
         return results
+    
+    def iter_process_overdue_chunks(
+        self,
+        batch_size: Optional[int] = None,
+        min_id: Optional[int] = None,
+        max_id: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Process overdue customers chunk by chunk, yielding each commit
+        batch's results once they are committed
+        """
+        if settings.DUNNING_EVALUATION_MODE == "vectorized":
+            # Imported lazily - numpy is only needed in vectorized mode
+            from app.services.vectorized_evaluator import VectorizedEvaluator
+            yield from VectorizedEvaluator(self).iter_process_chunks(batch_size, min_id, max_id)
+            return
+        
+        for customers in self.iter_overdue_customer_chunks(batch_size, min_id, max_id):
+            yield from self.iter_process_customer_chunk(customers)
+    
+    def iter_process_overdue_customers(
+        self,
+        batch_size: Optional[int] = None,
+        min_id: Optional[int] = None,
+        max_id: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Process overdue customers chunk by chunk, yielding each result
+        Memory stays flat regardless of the size of the customers table
+        """
+        for results in self.iter_process_overdue_chunks(batch_size, min_id, max_id):
+            for result in results:
+                yield result
+    
+    def process_all_overdue_customers(
+        self,
+        batch_size: Optional[int] = None,
+        min_id: Optional[int] = None,
+        max_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Process all overdue customers through dunning engine
+        """
+        return list(self.iter_process_overdue_customers(batch_size, min_id, max_id))
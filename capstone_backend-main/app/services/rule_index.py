@@ -0,0 +1,144 @@
+"""
+Compiled Rule Index - In-memory lookup of active dunning rules
+Built once per process and rebuilt only when the rule-set version changes
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.models.dunning_rule import DunningRule
+from app.models.rule_set_version import RuleSetVersion
+from app.utils.enums import CustomerType, ActionType, NotificationChannel
+
+logger = logging.getLogger(__name__)
+
+RULE_SET_VERSION_ID = 1
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """
+    Detached, immutable snapshot of an active dunning rule
+    """
+    id: int
+    rule_name: str
+    customer_type: CustomerType
+    trigger_day: int
+    action_type: ActionType
+    notification_channel: NotificationChannel
+    priority: int
+
+class RuleIndex:
+    """
+    Rules keyed by (customer_type, trigger_day):
+    1. CustomerType.ALL rules are merged into every concrete customer type
+    2. Each bucket is pre-sorted by priority (highest first)
+    3. The index is tagged with the rule-set version it was built from, so
+       every worker process notices CRUD changes with one primary-key lookup
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._rules: Dict[Tuple[CustomerType, int], List[CompiledRule]] = {}
+        self._trigger_days: Dict[CustomerType, Set[int]] = {}
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    def get_current_version(self, db: Session) -> int:
+        """
+        Read the shared rule-set version counter
+        """
+        version = db.query(RuleSetVersion.version).filter(
+            RuleSetVersion.id == RULE_SET_VERSION_ID
+        ).scalar()
+        return version or 0
+
+    def ensure_fresh(self, db: Session) -> None:
+        """
+        Rebuild the index if another request or worker changed the rule set
+        """
+        version = self.get_current_version(db)
+        if version != self._version:
+            self.rebuild(db, version)
+
+    def rebuild(self, db: Session, version: int) -> None:
+        """
+        Compile all active rules into the lookup table
+        """
+        with self._lock:
+            if version == self._version:
+                return
+
+            active_rules = db.query(DunningRule).filter(DunningRule.is_active == True).all()
+
+            rules: Dict[Tuple[CustomerType, int], List[CompiledRule]] = {}
+            for rule in active_rules:
+                compiled = CompiledRule(
+                    id=rule.id,
+                    rule_name=rule.rule_name,
+                    customer_type=rule.customer_type,
+                    trigger_day=rule.trigger_day,
+                    action_type=rule.action_type,
+                    notification_channel=rule.notification_channel,
+                    priority=rule.priority or 0
+                )
+
+                # ALL rules apply to every customer type (and to ALL itself)
+                if compiled.customer_type == CustomerType.ALL:
+                    customer_types = list(CustomerType)
+                else:
+                    customer_types = [compiled.customer_type]
+
+                for customer_type in customer_types:
+                    rules.setdefault((customer_type, compiled.trigger_day), []).append(compiled)
+
+            for bucket in rules.values():
+                bucket.sort(key=lambda r: (-r.priority, r.id))
+
+            trigger_days: Dict[CustomerType, Set[int]] = {}
+            for customer_type, trigger_day in rules:
+                trigger_days.setdefault(customer_type, set()).add(trigger_day)
+
+            self._rules = rules
+            self._trigger_days = trigger_days
+            self._version = version
+            logger.info(f"Rule index rebuilt: {len(active_rules)} active rules, version {version}")
+
+    def invalidate(self) -> None:
+        """
+        Force a rebuild on the next lookup in this process
+        """
+        with self._lock:
+            self._version = None
+
+    def get_rules(self, customer_type: CustomerType, trigger_day: int) -> List[CompiledRule]:
+        """
+        Get active rules for a customer type and overdue day, highest priority first
+        """
+        return self._rules.get((customer_type, trigger_day), [])
+
+    def get_trigger_days(self) -> Dict[CustomerType, Set[int]]:
+        """
+        Active trigger days per customer type (ALL rules already merged in)
+        """
+        return self._trigger_days
+
+def bump_rule_set_version(db: Session) -> None:
+    """
+    Increment the shared rule-set version within the caller's transaction
+    Call from every handler that creates, updates or deletes a dunning rule
+    """
+    updated = db.query(RuleSetVersion).filter(
+        RuleSetVersion.id == RULE_SET_VERSION_ID
+    ).update({RuleSetVersion.version: RuleSetVersion.version + 1}, synchronize_session=False)
+
+    if not updated:
+        db.add(RuleSetVersion(id=RULE_SET_VERSION_ID, version=1))
+
+    rule_index.invalidate()
+
+# Process-wide index shared by every RuleEngine instance
+rule_index = RuleIndex()
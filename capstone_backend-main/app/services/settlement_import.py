@@ -0,0 +1,253 @@
+"""
+Settlement Import - Bulk curing from gateway settlement files
+A settlement CSV is read as a stream and handled in chunks: one query finds the
+transaction ids already recorded, one finds the customers, new payments are
+written with one multi-row INSERT and cured with one commit per chunk
+Every CSV row gets an outcome, reported as one NDJSON line, then a summary
+
+Run by hand:
+    python -m app.services.settlement_import settlement.csv [--chunk-size N] > report.ndjson
+"""
+import argparse
+import csv
+import json
+import logging
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.customer import Customer
+from app.models.payment import Payment
+from app.schemas.payment import PaymentWebhook
+from app.utils.enums import PaymentStatus
+from app.services.curing_service import CuringService
+from app.services.payment_ingestion import PaymentIngestionService, parse_payment_method, webhook_payment_status
+from app.utils.exceptions import InvalidPaymentException
+
+logger = logging.getLogger(__name__)
+
+# Same fields as the payment webhook; status defaults to success and gateway_reference is optional
+REQUIRED_COLUMNS = ("transaction_id", "customer_id", "amount", "payment_method", "timestamp")
+
+# Row outcomes
+CURED = "cured"
+CURING_FAILED = "curing_failed"
+RECORDED = "recorded"  # Not a successful payment, stored without curing
+DUPLICATE = "duplicate"
+CUSTOMER_NOT_FOUND = "customer_not_found"
+INVALID = "invalid"
+OUTCOMES = (CURED, CURING_FAILED, RECORDED, DUPLICATE, CUSTOMER_NOT_FOUND, INVALID)
+
+def open_settlement_csv(text: TextIO) -> csv.DictReader:
+    """
+    CSV reader over a settlement file, checked for the required columns
+    Raises: InvalidPaymentException
+    """
+    reader = csv.DictReader(text)
+    columns = [name.strip() for name in (reader.fieldnames or [])]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise InvalidPaymentException(f"Settlement file is missing columns: {', '.join(missing)}")
+    reader.fieldnames = columns
+    return reader
+
+def parse_settlement_row(row: Dict[str, Optional[str]]) -> PaymentWebhook:
+    values = {key: value.strip() for key, value in row.items() if key and value and value.strip()}
+    values.setdefault("status", "success")
+    return PaymentWebhook(**values)
+
+class SettlementImportService:
+    """
+    Imports settlement file rows chunk by chunk:
+    1. Validates every row of the chunk
+    2. Marks duplicates - transaction ids already stored (one IN query) or
+       repeated earlier in the file - and rows of unknown customers (one IN query)
+    3. Inserts the new payments with one multi-row INSERT and commits them
+       (PaymentIngestionService.insert_many)
+    4. Loads the new payments and their customers (one query each) and cures
+       the successful ones with CuringService.execute_curing_batch
+    """
+
+    def __init__(self, db: Session, chunk_size: Optional[int] = None):
+        self.db = db
+        self.chunk_size = chunk_size or settings.SETTLEMENT_CHUNK_SIZE
+
+    def outcome(self, line: int, status: str, transaction_id: Optional[str] = None, customer_id: Optional[int] = None,
+                payment_id: Optional[int] = None, message: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "line": line,
+            "transaction_id": transaction_id,
+            "customer_id": customer_id,
+            "status": status,
+            "payment_id": payment_id,
+            "message": message
+        }
+
+    def import_chunk(self, rows: List[Tuple[int, Dict[str, Optional[str]]]]) -> List[Dict[str, Any]]:
+        """
+        Import (line number, CSV row) pairs
+        Returns: one outcome per row, in file order
+        """
+        outcomes: Dict[int, Dict[str, Any]] = {}
+        parsed: List[Tuple[int, PaymentWebhook, Dict[str, Any]]] = []
+
+        # Step 1: Validate rows
+        for line, row in rows:
+            try:
+                webhook = parse_settlement_row(row)
+                parsed.append((line, webhook, {
+                    "customer_id": webhook.customer_id,
+                    "amount": webhook.amount,
+                    "payment_method": parse_payment_method(webhook.payment_method),
+                    "payment_status": webhook_payment_status(webhook),
+                    "transaction_id": webhook.transaction_id,
+                    "payment_date": webhook.timestamp
+                }))
+            except ValidationError as e:
+                errors = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+                outcomes[line] = self.outcome(line, INVALID, (row.get("transaction_id") or "").strip() or None, message=errors)
+            except InvalidPaymentException as e:
+                outcomes[line] = self.outcome(line, INVALID, webhook.transaction_id, webhook.customer_id, message=str(e))
+
+        # Step 2: Dedupe and check customers in bulk
+        transaction_ids = {webhook.transaction_id for _, webhook, _ in parsed}
+        customer_ids = {webhook.customer_id for _, webhook, _ in parsed}
+        seen = {
+            transaction_id for (transaction_id,) in
+            self.db.query(Payment.transaction_id).filter(Payment.transaction_id.in_(transaction_ids))
+        } if transaction_ids else set()
+        known_customers = {
+            customer_id for (customer_id,) in
+            self.db.query(Customer.id).filter(Customer.id.in_(customer_ids))
+        } if customer_ids else set()
+
+        new_rows = []
+        for line, webhook, values in parsed:
+            if webhook.transaction_id in seen:
+                outcomes[line] = self.outcome(line, DUPLICATE, webhook.transaction_id, webhook.customer_id,
+                                              message="Payment already processed")
+            elif webhook.customer_id not in known_customers:
+                outcomes[line] = self.outcome(line, CUSTOMER_NOT_FOUND, webhook.transaction_id, webhook.customer_id,
+                                              message=f"Customer {webhook.customer_id} not found")
+            else:
+                seen.add(webhook.transaction_id)
+                new_rows.append((line, webhook, values))
+
+        # Step 3: Multi-row insert
+        if new_rows:
+            inserted = PaymentIngestionService(self.db).insert_many([values for _, _, values in new_rows])
+            self.db.commit()
+
+            # Step 4: Cure the new payments in one batch
+            payments = {
+                payment.transaction_id: payment for payment in
+                self.db.query(Payment).filter(Payment.transaction_id.in_(inserted))
+            } if inserted else {}
+            customers = {
+                customer.id: customer for customer in
+                self.db.query(Customer).filter(Customer.id.in_({webhook.customer_id for _, webhook, _ in new_rows}))
+            }
+
+            to_cure = []
+            for line, webhook, _ in new_rows:
+                payment = payments.get(webhook.transaction_id)
+                if payment is None:
+                    # Lost the race to a webhook for the same transaction
+                    outcomes[line] = self.outcome(line, DUPLICATE, webhook.transaction_id, webhook.customer_id,
+                                                  message="Payment already processed")
+                elif payment.payment_status == PaymentStatus.SUCCESS:
+                    to_cure.append((line, payment))
+                else:
+                    outcomes[line] = self.outcome(line, RECORDED, webhook.transaction_id, webhook.customer_id, payment.id,
+                                                  message="Payment failed")
+
+            results = CuringService(self.db).execute_curing_batch([payment for _, payment in to_cure], customers)
+            for (line, payment), result in zip(to_cure, results):
+                outcomes[line] = self.outcome(
+                    line,
+                    CURED if result.get("success") else CURING_FAILED,
+                    payment.transaction_id,
+                    payment.customer_id,
+                    payment.id,
+                    result.get("message")
+                )
+
+        return [outcomes[line] for line, _ in rows]
+
+    def import_rows(self, reader: Iterable[Dict[str, Optional[str]]]) -> Iterator[Dict[str, Any]]:
+        """
+        Import a stream of CSV rows, yielding each row's outcome as soon as its
+        chunk is done and a {"summary": {...}} record at the end
+        """
+        counts = {outcome: 0 for outcome in OUTCOMES}
+        chunk = []
+        # Line 1 is the header
+        for line, row in enumerate(reader, start=2):
+            chunk.append((line, row))
+            if len(chunk) < self.chunk_size:
+                continue
+            for result in self.import_chunk(chunk):
+                counts[result["status"]] += 1
+                yield result
+            chunk = []
+            # Keep the identity map from growing with the file
+            self.db.expunge_all()
+
+        if chunk:
+            for result in self.import_chunk(chunk):
+                counts[result["status"]] += 1
+                yield result
+
+        logger.info(f"Settlement import finished: {counts}")
+        yield {"summary": {"rows": sum(counts.values()), **counts}}
+
+def ndjson_lines(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, default=str) + "\n"
+
+def stream_settlement_import(reader: Iterable[Dict[str, Optional[str]]], chunk_size: Optional[int] = None) -> Iterator[str]:
+    """
+    NDJSON settlement import with a dedicated session (for StreamingResponse)
+    The request session may be closed before the body finishes streaming
+    """
+    db = SessionLocal()
+    try:
+        yield from ndjson_lines(SettlementImportService(db, chunk_size).import_rows(reader))
+    except Exception as e:
+        logger.error(f"Streaming settlement import failed: {str(e)}")
+        db.rollback()
+        yield json.dumps({"error": str(e)}) + "\n"
+    finally:
+        db.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record and cure the payments of a gateway settlement CSV")
+    parser.add_argument("path", help="Settlement CSV file")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per transaction (default: SETTLEMENT_CHUNK_SIZE)")
+    parser.add_argument("--output", default=None, help="NDJSON report file (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    db = SessionLocal()
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        with open(args.path, newline="", encoding="utf-8-sig") as settlement_file:
+            reader = open_settlement_csv(settlement_file)
+            for line in ndjson_lines(SettlementImportService(db, args.chunk_size).import_rows(reader)):
+                output.write(line)
+    except InvalidPaymentException as e:
+        logger.error(str(e))
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        db.close()
+
+if __name__ == "__main__":
+    main()
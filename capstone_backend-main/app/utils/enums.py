@@ -32,6 +32,16 @@ class NotificationStatus(str, Enum):
     SENT = "SENT"
     FAILED = "FAILED"
     DELIVERED = "DELIVERED"
+    DEAD_LETTER = "DEAD_LETTER"
+
+class NotificationLane(str, Enum):
+    URGENT = "URGENT"
+    STANDARD = "STANDARD"
+    BULK = "BULK"
+
+class DeliveryReceiptStatus(str, Enum):
+    DELIVERED = "DELIVERED"
+    FAILED = "FAILED"
 
 class PaymentMethod(str, Enum):
     CREDIT_CARD = "CREDIT_CARD"
@@ -44,3 +54,16 @@ class PaymentStatus(str, Enum):
     PENDING = "PENDING"
     SUCCESS = "SUCCESS"
     FAILED = "FAILED"
+
+class DunningJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+class CuringJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
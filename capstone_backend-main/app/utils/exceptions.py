@@ -25,6 +25,12 @@ class InvalidPaymentException(Exception):
     def __init__(self, message: str):
         super().__init__(f"Invalid payment: {message}")
 
+class ConcurrentUpdateException(Exception):
+    """Raised when a customer keeps changing under a compare-and-swap update"""
+    def __init__(self, customer_id: int):
+        self.customer_id = customer_id
+        super().__init__(f"Customer {customer_id} was updated concurrently, giving up after retries")
+
 class NotificationFailedException(Exception):
     """Raised when notification sending fails"""
     def __init__(self, channel: str, customer_id: int):
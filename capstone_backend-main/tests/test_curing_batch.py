@@ -0,0 +1,97 @@
+"""
+Batched curing - several payments of one customer in one batch
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import app.models  # noqa: F401 - registers every table on Base
+from app.config.database import Base
+from app.models.customer import Customer
+from app.models.curing_action import CuringAction
+from app.models.payment import Payment
+from app.services.curing_service import CuringService
+from app.utils.enums import CustomerType, DunningStatus, PaymentMethod, PaymentStatus
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    # pysqlite only honours SAVEPOINT when SQLAlchemy emits BEGIN itself
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+def add_customer(db, outstanding: str) -> Customer:
+    customer = Customer(
+        name="Test Customer",
+        email="customer@example.com",
+        phone="9000000000",
+        customer_type=CustomerType.PREPAID,
+        plan_type="Basic",
+        billing_date=date.today() - timedelta(days=40),
+        due_date=date.today() - timedelta(days=10),
+        overdue_days=10,
+        outstanding_amount=Decimal(outstanding),
+        dunning_status=DunningStatus.RESTRICTED
+    )
+    db.add(customer)
+    db.commit()
+    return customer
+
+def add_payment(db, customer: Customer, amount: str, transaction_id: str) -> Payment:
+    payment = Payment(
+        customer_id=customer.id,
+        amount=Decimal(amount),
+        payment_method=PaymentMethod.UPI,
+        payment_status=PaymentStatus.SUCCESS,
+        transaction_id=transaction_id
+    )
+    db.add(payment)
+    db.commit()
+    return payment
+
+def test_batch_applies_every_payment_of_a_customer(db):
+    customer = add_customer(db, "300.00")
+    payments = [add_payment(db, customer, "100.00", "TXN-1"), add_payment(db, customer, "50.00", "TXN-2")]
+
+    results = CuringService(db).execute_curing_batch(payments, {customer.id: customer})
+
+    assert [result["success"] for result in results] == [True, True]
+    assert [result["remaining_balance"] for result in results] == [200.0, 150.0]
+    assert results[0]["previous_status"] == DunningStatus.RESTRICTED.value
+    assert results[1]["previous_status"] == DunningStatus.ACTIVE.value
+
+    db.expire_all()
+    customer = db.get(Customer, customer.id)
+    assert customer.outstanding_amount == Decimal("150.00")
+    assert customer.dunning_status == DunningStatus.ACTIVE
+    assert db.query(CuringAction).filter(CuringAction.customer_id == customer.id).count() == 2
+
+def test_batch_clears_due_dates_once_the_balance_is_paid(db):
+    customer = add_customer(db, "120.00")
+    payments = [add_payment(db, customer, "100.00", "TXN-1"), add_payment(db, customer, "20.00", "TXN-2")]
+
+    results = CuringService(db).execute_curing_batch(payments, {customer.id: customer})
+
+    assert [result["remaining_balance"] for result in results] == [20.0, 0.0]
+
+    db.expire_all()
+    customer = db.get(Customer, customer.id)
+    assert customer.outstanding_amount == Decimal("0.00")
+    assert customer.due_date is None
+    assert customer.next_action_date is None
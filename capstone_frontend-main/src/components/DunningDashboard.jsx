@@ -103,6 +103,7 @@ const DunningDashboard = () => {
   const [overdueData, setOverdueData] = useState([]);
   const [executing, setExecuting] = useState(false);
   const [executionResult, setExecutionResult] = useState(null);
+  const [processedCount, setProcessedCount] = useState(0);
 
   useEffect(() => {
     fetchDashboardData();
@@ -168,8 +169,11 @@ const DunningDashboard = () => {
   const handleTriggerDunning = async () => {
     setExecuting(true);
     setExecutionResult(null);
+    setProcessedCount(0);
     try {
-      const result = await dunningService.triggerDunningAll();
+      const result = await dunningService.triggerDunningStream(() =>
+        setProcessedCount((count) => count + 1)
+      );
       setExecutionResult(result);
       fetchDashboardData();
     } catch (error) {
@@ -225,7 +229,7 @@ const DunningDashboard = () => {
             '&:hover': { backgroundColor: buttonHoverColor },
           }}
         >
-          {executing ? 'Executing...' : 'Trigger Dunning'}
+          {executing ? `Executing... (${processedCount})` : 'Trigger Dunning'}
         </Button>
       </Box>
 
@@ -245,6 +249,8 @@ const DunningDashboard = () => {
               <Typography variant="caption">
                 Processed: {executionResult.total_customers} | Success: {executionResult.successful} | 
                 Failed: {executionResult.failed} | Skipped: {executionResult.skipped}
+                {executionResult.time_to_first_result_ms != null &&
+                  ` | First result: ${executionResult.time_to_first_result_ms} ms`}
               </Typography>
             </Box>
           )}
@@ -1,4 +1,4 @@
-import api from './api';
+import api, { API_BASE_URL } from './api';
 
 export const dunningService = {
   getAllRules: async (params = {}) => {
@@ -35,6 +35,52 @@ export const dunningService = {
     return response.data;
   },
 
+  // Streams NDJSON results: onResult is called per customer as results arrive,
+  // the resolved value is the final summary line
+  triggerDunningStream: async (onResult, customerIds = null) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_BASE_URL}/api/v1/dunning/apply/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({ customer_ids: customerIds }),
+    });
+    if (!response.ok) {
+      throw new Error(`Dunning stream failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let summary = null;
+
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      const event = JSON.parse(line);
+      if (event.type === 'result') {
+        onResult?.(event);
+      } else if (event.type === 'summary') {
+        summary = event;
+      } else if (event.type === 'error') {
+        throw new Error(event.message);
+      }
+    };
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      lines.forEach(handleLine);
+    }
+    handleLine(buffer);
+
+    return summary;
+  },
+
   triggerDunningSingle: async (customerId) => {
     const response = await api.post(`/dunning/apply/${customerId}`);
     return response.data;
@@ -4,6 +4,14 @@
 -- ============================================================
 
 -- Drop existing tables if they exist
+DROP TABLE IF EXISTS curing_jobs;
+DROP TABLE IF EXISTS retention_cursors;
+DROP TABLE IF EXISTS archive_batches;
+DROP TABLE IF EXISTS rate_limit_buckets;
+DROP TABLE IF EXISTS dunning_job_results;
+DROP TABLE IF EXISTS dunning_jobs;
+DROP TABLE IF EXISTS dunning_run_ledger;
+DROP TABLE IF EXISTS rule_set_version;
 DROP TABLE IF EXISTS dunning_logs;
 DROP TABLE IF EXISTS curing_actions;
 DROP TABLE IF EXISTS notifications;
@@ -27,11 +35,15 @@ CREATE TABLE customers (
     overdue_days INT DEFAULT 0,
     outstanding_amount DECIMAL(10, 2) DEFAULT 0.00,
     dunning_status ENUM('ACTIVE', 'NOTIFIED', 'RESTRICTED', 'BARRED', 'CURED') DEFAULT 'ACTIVE',
+    next_action_date DATE NULL COMMENT 'Next date an active dunning rule fires',
+    version INT NOT NULL DEFAULT 0 COMMENT 'Optimistic concurrency counter, bumped by every update',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_customer_type (customer_type),
     INDEX idx_dunning_status (dunning_status),
-    INDEX idx_overdue_days (overdue_days)
+    INDEX idx_overdue_days (overdue_days),
+    INDEX idx_customer_type_due_date (customer_type, due_date),
+    INDEX idx_next_action_date (next_action_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ============================================================
@@ -82,15 +94,25 @@ CREATE TABLE notifications (
     customer_id INT NOT NULL,
     rule_id INT,
     channel ENUM('SMS', 'EMAIL', 'APP') NOT NULL,
-    message TEXT NOT NULL,
-    status ENUM('PENDING', 'SENT', 'FAILED', 'DELIVERED') DEFAULT 'PENDING',
+    message TEXT COMMENT 'Free text; NULL when rendered from template_id',
+    template_id VARCHAR(64) COMMENT 'Versioned notification template id',
+    template_params JSON,
+    status ENUM('PENDING', 'SENT', 'FAILED', 'DELIVERED', 'DEAD_LETTER') DEFAULT 'PENDING',
+    lane ENUM('URGENT', 'STANDARD', 'BULK') NOT NULL DEFAULT 'STANDARD' COMMENT 'Dispatch priority lane',
     sent_at TIMESTAMP NULL,
+    attempt_count INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NULL COMMENT 'When a FAILED send is retried',
+    last_error TEXT,
+    provider_message_id VARCHAR(100) COMMENT 'Gateway message id, the key of delivery receipts',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE,
     FOREIGN KEY (rule_id) REFERENCES dunning_rules(id) ON DELETE SET NULL,
     INDEX idx_customer_id (customer_id),
     INDEX idx_status (status),
-    INDEX idx_channel (channel)
+    INDEX idx_channel (channel),
+    INDEX idx_provider_message_id (provider_message_id),
+    INDEX idx_notification_status_next_attempt (status, next_attempt_at),
+    INDEX idx_notification_lane_status_next_attempt (lane, status, next_attempt_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ============================================================
@@ -131,6 +153,136 @@ CREATE TABLE dunning_logs (
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- ============================================================
+-- Table: rule_set_version
+-- Single-row counter bumped on every dunning rule change
+-- Workers compare it to rebuild their in-memory rule index
+-- ============================================================
+CREATE TABLE rule_set_version (
+    id INT PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO rule_set_version (id, version) VALUES (1, 0);
+
+-- ============================================================
+-- Table: dunning_run_ledger
+-- (customer, rule, as-of date) tuples already executed
+-- Makes reruns and crash retries of a daily run idempotent
+-- ============================================================
+CREATE TABLE dunning_run_ledger (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    as_of_date DATE NOT NULL,
+    customer_id INT NOT NULL,
+    rule_id INT NOT NULL,
+    executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE,
+    FOREIGN KEY (rule_id) REFERENCES dunning_rules(id) ON DELETE CASCADE,
+    UNIQUE KEY uq_ledger_date_customer_rule (as_of_date, customer_id, rule_id),
+    INDEX idx_customer_id (customer_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================
+-- Table: dunning_jobs
+-- Background dunning runs with live progress counters
+-- ============================================================
+CREATE TABLE dunning_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    status ENUM('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED') NOT NULL DEFAULT 'QUEUED',
+    request JSON COMMENT 'Execution request the job was started with',
+    total_customers INT DEFAULT 0,
+    unmatched_customers INT DEFAULT 0 COMMENT 'Overdue customers no rule fires for, skipped up front',
+    processed INT DEFAULT 0,
+    successful INT DEFAULT 0,
+    failed INT DEFAULT 0,
+    skipped INT DEFAULT 0,
+    cancel_requested BOOLEAN DEFAULT FALSE,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL,
+    INDEX idx_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================
+-- Table: dunning_job_results
+-- Per-customer results of background dunning jobs
+-- ============================================================
+CREATE TABLE dunning_job_results (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id INT NOT NULL,
+    customer_id INT NOT NULL,
+    customer_name VARCHAR(100),
+    overdue_days INT DEFAULT 0,
+    rules_applied INT DEFAULT 0,
+    actions_taken JSON,
+    notifications_sent INT DEFAULT 0,
+    status VARCHAR(20) NOT NULL COMMENT 'SUCCESS, FAILED, SKIPPED',
+    message TEXT,
+    FOREIGN KEY (job_id) REFERENCES dunning_jobs(id) ON DELETE CASCADE,
+    INDEX idx_job_id (job_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================
+-- Table: rate_limit_buckets
+-- Token buckets shared by all notification workers
+-- ============================================================
+CREATE TABLE rate_limit_buckets (
+    name VARCHAR(50) PRIMARY KEY COMMENT 'e.g. notification:SMS',
+    tokens DOUBLE NOT NULL,
+    refilled_at DOUBLE NOT NULL COMMENT 'Unix time of the last refill'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================
+-- Table: archive_batches
+-- Notifications and dunning logs past retention, one compressed chunk per row
+-- ============================================================
+CREATE TABLE archive_batches (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL COMMENT 'Source table, e.g. notifications',
+    first_id INT NOT NULL,
+    last_id INT NOT NULL,
+    row_count INT NOT NULL,
+    oldest_created_at TIMESTAMP NULL,
+    newest_created_at TIMESTAMP NULL,
+    payload LONGBLOB NOT NULL COMMENT 'zlib-compressed JSON rows',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_archive_table_first_id (table_name, first_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================
+-- Table: retention_cursors
+-- Where each table's retention scan resumes
+-- ============================================================
+CREATE TABLE retention_cursors (
+    table_name VARCHAR(50) PRIMARY KEY COMMENT 'Archived table, e.g. notifications',
+    last_scanned_id INT NOT NULL DEFAULT 0 COMMENT 'The next run resumes after this id',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================
+-- Table: curing_jobs
+-- Durable queue of curing runs for payments acknowledged with 202
+-- ============================================================
+CREATE TABLE curing_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    payment_id INT NOT NULL,
+    customer_id INT NOT NULL,
+    status ENUM('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED') NOT NULL DEFAULT 'QUEUED',
+    attempts INT NOT NULL DEFAULT 0,
+    result JSON COMMENT 'CuringService.execute_curing result',
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL,
+    FOREIGN KEY (payment_id) REFERENCES payments(id) ON DELETE CASCADE,
+    FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE,
+    UNIQUE KEY uq_curing_job_payment (payment_id),
+    INDEX idx_curing_job_status (status),
+    INDEX idx_curing_job_customer_status (customer_id, status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- ============================================================
 -- End of Schema
 -- ============================================================
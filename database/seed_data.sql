@@ -70,6 +70,24 @@ INSERT INTO dunning_logs (customer_id, rule_id, action_type, status, details, cr
 (9, 1, 'NOTIFY', 'SUCCESS', '{"channel": "SMS", "message_sent": true, "overdue_days": 2}', '2025-10-10 09:00:00'),
 (9, 7, 'BAR_OUTGOING', 'SUCCESS', '{"action": "outgoing_barred", "overdue_days": 15}', '2025-10-18 10:00:00');
 
+-- Build the dunning schedule: the daily run only selects customers whose
+-- next_action_date <= today, so owing customers need their next trigger date
+-- (same rule as DunningScheduler; the API also backfills NULL rows at startup
+-- and POST /api/v1/dunning/schedule/rebuild recomputes every customer)
+UPDATE customers c
+SET c.next_action_date = (
+    SELECT MIN(DATE_ADD(c.due_date, INTERVAL r.trigger_day DAY))
+    FROM dunning_rules r
+    WHERE r.is_active = TRUE
+      AND r.trigger_day > 0
+      AND r.customer_type IN (c.customer_type, 'ALL')
+      AND DATE_ADD(c.due_date, INTERVAL r.trigger_day DAY) >= CURDATE()
+),
+    c.version = c.version + 1
+WHERE c.next_action_date IS NULL
+  AND c.due_date IS NOT NULL
+  AND c.outstanding_amount > 0;
+
 -- ============================================================
 -- End of Seed Data
 -- ============================================================
@@ -87,3 +105,4 @@ UNION ALL
 SELECT 'Curing Actions', COUNT(*) FROM curing_actions
 UNION ALL
 SELECT 'Dunning Logs', COUNT(*) FROM dunning_logs;
+